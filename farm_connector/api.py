@@ -3,46 +3,287 @@ Farm Connector API Endpoints
 Provides REST API endpoints for the Farm Connector PWA
 """
 
-import frappe
+import base64
+import gzip
 import json
 
+import frappe
+from frappe.utils import add_to_date, cint, flt, get_datetime, now_datetime
+from werkzeug.wrappers import Response
+
+from farm_connector import (
+	cache,
+	conditional,
+	encoding,
+	geo,
+	mvt,
+	overlap,
+	realtime,
+	tile_cache,
+)
+from farm_connector.farm_connector.doctype.form_assignment.form_assignment import (
+	ASSIGNMENT_FIELDS,
+	OPEN_ASSIGNMENT_STATUSES,
+)
+from farm_connector.farm_connector.doctype.form_assignment_tombstone.form_assignment_tombstone import (
+	get_retention_horizon,
+)
+from farm_connector.farm_connector.doctype.geo_feature.geo_feature import (
+	is_indexed,
+	is_served,
+	queue_rebuild,
+)
+from farm_connector.template_schema import get_template_hashes, get_template_schema
+
+# Upper bound on the offline tile manifest returned by get_assigned_forms
+MAX_MANIFEST_TILES = 20000
+
+# Limits applied to the requested manifest zoom and buffer
+MAX_MANIFEST_ZOOM = 18
+MAX_MANIFEST_BUFFER_KM = 10
+
+# Page sizes of the paginated get_assigned_forms mode
+DEFAULT_ASSIGNMENT_PAGE_SIZE = 200
+MAX_ASSIGNMENT_PAGE_SIZE = 1000
+
+# How far sync tokens trail the server clock
+SYNC_TOKEN_OVERLAP_SECONDS = 60
+
 
 @frappe.whitelist()
-def get_assigned_forms():
+@encoding.negotiated
+def get_assigned_forms(
+	since=None,
+	include_tiles=0,
+	min_zoom=12,
+	max_zoom=16,
+	buffer_km=1,
+	etag=None,
+	page_size=None,
+	cursor=None
+):
 	"""
 	Get forms assigned to the current user
 	Returns forms, projects, and farm locations for offline caching
 	
+	Args:
+		since (str): Optional. sync_token of the previous sync; only assignments created or
+			changed after it are returned, plus the ones removed from the list
+		include_tiles (bool): Optional. Also return the merged map tiles to pre-download
+		min_zoom (int): Lowest zoom of the tile manifest (default 12)
+		max_zoom (int): Highest zoom of the tile manifest (default 16, at most MAX_MANIFEST_ZOOM)
+		buffer_km (float): Distance around each farm location to cover
+			(default 1km, at most MAX_MANIFEST_BUFFER_KM)
+		etag (str): Optional. etag of the copy held by the client; an If-None-Match header works too
+		page_size (int): Optional. Return the assignments in pages of this size, newest first;
+			forms, projects and farm_locations then cover the page only
+		cursor (str): Optional. next_cursor of the previous page
+	
 	Returns:
 		dict: {
+			"etag": Version of the user's assignment list,
 			"forms": List of form assignments,
 			"projects": List of unique projects,
-			"farm_locations": List of farm coordinates for tile pre-download
+			"templates": [{name, content_hash}] of the referenced PGS Templates; each assignment
+				also carries pgs_template_hash,
+			"farm_locations": List of farm coordinates for tile pre-download,
+			"sync_token": Token to pass as since on the next sync,
+			"full_sync": Only with since: True if the token expired and everything was re-sent,
+			"removed": Only with since: [{name, reason}] of completed, cancelled,
+				reassigned or deleted assignments,
+			"tile_manifest": Only with include_tiles: {min_zoom, max_zoom, buffer_km, count,
+				tiles: deduplicated [z, x, y] list covering every farm location, truncated: True if
+				more than MAX_MANIFEST_TILES were needed and max_zoom was lowered to fit},
+			"next_cursor": Only when paginated: cursor of the next page, None on the last page
 		}
+		Returns a 304 response or {"unchanged": True, "etag"} when the client's copy is current.
 	"""
 	user = frappe.session.user
 	
+	# Full syncs are cached per user until an assignment of the user or a project location changes
+	cache_params = (cint(include_tiles), cint(min_zoom), cint(max_zoom), flt(buffer_km))
+	cacheable = not (since or cint(page_size) or cursor)
+	# Read before the database, so a response built from data changed meanwhile is not cached
+	generation = cache.get_assigned_forms_generation(user) if cacheable else None
+	cached = cache.get_assigned_forms(user, cache_params) if cacheable else None
+	
+	# Skip building the payload when the client already has this version
+	if cached:
+		current_etag = cached['etag']
+	else:
+		current_etag = _get_assignments_etag(user, include_tiles, min_zoom, max_zoom, buffer_km, page_size, cursor)
+	not_modified = conditional.get_not_modified_response(current_etag, etag)
+	if not_modified:
+		return not_modified
+	
+	if cached:
+		return cached
+	
+	# Keyset pagination: later pages carry the position and the sync token of the first page
+	paginated = bool(cint(page_size) or cursor)
+	last_date = last_name = None
+	if cursor:
+		try:
+			last_date, last_name, sync_token = _decode_cursor(cursor)
+		except (TypeError, ValueError):
+			frappe.throw("Invalid cursor")
+	
+	# Delta sync: only assignments changed since the token, plus removals
+	if not cursor:
+		sync_token = _get_sync_token()
+	since_datetime = _parse_sync_token(since) if since else None
+	full_sync = not since_datetime or since_datetime < get_retention_horizon()
+	
+	filters = {
+		'user': user,
+		'status': ['in', OPEN_ASSIGNMENT_STATUSES]
+	}
+	if not full_sync:
+		filters['modified'] = ['>', since_datetime]
+	
 	# Get form assignments for this user
-	assignments = frappe.get_all(
-		'Form Assignment',
-		filters={
-			'user': user,
-			'status': ['in', ['Pending', 'In Progress']]
-		},
-		fields=[
-			'name',
-			'doctype_name',
-			'description',
-			'assigned_date',
-			'due_date',
-			'status',
-			'project',
-			'location',
-			'pgs_template'
-		],
-		order_by='assigned_date desc'
-	)
+	if paginated:
+		assignments, next_cursor = _get_assignment_page(
+			filters, cint(page_size) or DEFAULT_ASSIGNMENT_PAGE_SIZE, last_date, last_name, sync_token
+		)
+	else:
+		assignments = frappe.get_all(
+			'Form Assignment',
+			filters=filters,
+			fields=ASSIGNMENT_FIELDS,
+			order_by='assigned_date desc'
+		)
+	
+	response = _build_assignment_payload(assignments)
+	response['etag'] = current_etag
+	response['sync_token'] = sync_token
+	
+	if paginated:
+		response['next_cursor'] = next_cursor
 	
+	# Removals are sent once, with the first page
+	if since and not cursor:
+		response['full_sync'] = full_sync
+		response['removed'] = [] if full_sync else _get_removed_assignments(
+			user, since_datetime, {a.name for a in assignments}
+		)
+	
+	if cint(include_tiles):
+		response['tile_manifest'] = _get_tile_manifest(response['farm_locations'], min_zoom, max_zoom, buffer_km)
+	
+	if cacheable:
+		# A cached response keeps its sync token; the next delta sync then re-sends a little more
+		cache.set_assigned_forms(user, cache_params, response, generation)
+	
+	return response
+
+
+def _get_assignment_page(filters, page_size, last_date=None, last_name=None, sync_token=None):
+	"""
+	Return one page of assignments ordered by (assigned_date, name) descending, after the given
+	position, and the cursor of the next page (None on the last page).
+	Assignments without an assigned_date sort last.
+	"""
+	page_size = min(cint(page_size), MAX_ASSIGNMENT_PAGE_SIZE)
+	if page_size < 1:
+		frappe.throw("page_size must be a positive number")
+
+	values = {
+		'user': filters['user'],
+		'statuses': tuple(OPEN_ASSIGNMENT_STATUSES),
+		'page_size': page_size + 1
+	}
+	conditions = ['user = %(user)s', 'status in %(statuses)s']
+
+	if 'modified' in filters:
+		conditions.append('modified > %(since)s')
+		values['since'] = filters['modified'][1]
+
+	if last_name:
+		values['last_date'], values['last_name'] = last_date, last_name
+		if last_date is None:
+			conditions.append('assigned_date is null and name < %(last_name)s')
+		else:
+			conditions.append("""(assigned_date < %(last_date)s or assigned_date is null
+				or (assigned_date = %(last_date)s and name < %(last_name)s))""")
+
+	assignments = frappe.db.sql(
+		f"""
+		select {', '.join(f'`{field}`' for field in ASSIGNMENT_FIELDS)}
+		from `tabForm Assignment`
+		where {' and '.join(conditions)}
+		order by assigned_date desc, name desc
+		limit %(page_size)s
+		""",
+		values,
+		as_dict=True
+	)
+
+	next_cursor = None
+	if len(assignments) > page_size:
+		assignments = assignments[:page_size]
+		last = assignments[-1]
+		next_cursor = _encode_cursor([last.assigned_date, last.name, sync_token])
+
+	return assignments, next_cursor
+
+
+def _get_assignments_etag(user, *params):
+	"""
+	Fingerprint a user's assignment list from aggregate queries, including the last change
+	of the referenced Projects, whose coordinates are the fallback farm locations,
+	and the submitted PGS Templates, whose content hashes are sent with the list.
+	"""
+	count, last_modified = frappe.db.sql(
+		"""select count(*), max(modified) from `tabForm Assignment` where user = %s""",
+		user
+	)[0]
+	last_removed = frappe.db.sql(
+		"""select max(creation) from `tabForm Assignment Tombstone` where user = %s""",
+		user
+	)[0][0]
+	return conditional.make_etag(
+		'assignments', user, count, last_modified, last_removed, _get_projects_modified(user),
+		*_get_templates_state(user), *params
+	)
+
+
+def _get_projects_modified(user):
+	"""Return the last modified timestamp of the Projects referenced by a user's assignments."""
+	if not frappe.db.table_exists('Project'):
+		return None
+
+	return frappe.db.sql(
+		"""
+		select max(modified) from `tabProject`
+		where name in (
+			select project from `tabForm Assignment` where user = %s and project is not null
+		)
+		""",
+		user
+	)[0][0]
+
+
+def _get_templates_state(user):
+	"""
+	Return "name:content_hash" of the submitted PGS Templates of a user's assignments,
+	which changes when one of them is cancelled, deleted or amended.
+	"""
+	templates = frappe.db.sql(
+		"""
+		select name, content_hash from `tabPGS Template`
+		where docstatus = 1 and name in (
+			select pgs_template from `tabForm Assignment` where user = %s and pgs_template is not null
+		)
+		order by name
+		""",
+		user
+	)
+	return [f'{name}:{content_hash}' for name, content_hash in templates]
+
+
+def _build_assignment_payload(assignments):
+	"""Derive the forms, projects and farm locations of a list of assignments."""
 	# Build forms list with unique DocTypes
 	forms = []
 	seen_doctypes = set()
@@ -68,9 +309,18 @@ def get_assigned_forms():
 	# Build projects list
 	projects = [{'id': p, 'name': p} for p in projects_set]
 	
+	# Content hashes let devices keep template definitions until the hash changes
+	template_hashes = get_template_hashes({a.get('pgs_template') for a in assignments})
+	for assignment in assignments:
+		assignment['pgs_template_hash'] = template_hashes.get(assignment.get('pgs_template'))
+	templates = [{'name': name, 'content_hash': content_hash} for name, content_hash in template_hashes.items()]
+	
 	# Get farm locations for tile pre-download
 	farm_locations = []
 	
+	# Resolve every project fallback location at once (shared cache, one query for misses)
+	project_locations = cache.get_project_locations(projects_set)
+	
 	for assignment in assignments:
 		loc_data = {}
 		
@@ -124,17 +374,7 @@ def get_assigned_forms():
 
 		# 3. Fallback to Project Location
 		if not loc_data and assignment.get('project'):
-			try:
-				project_name = assignment.get('project')
-				# Check if project has location fields
-				if frappe.db.exists('Project', project_name):
-					# Try generic fields
-					proj = frappe.db.get_value('Project', project_name, ['latitude', 'longitude', 'location'], as_dict=True)
-					if proj:
-						if proj.get('latitude') and proj.get('longitude'):
-							loc_data = {'lat': proj.get('latitude'), 'lng': proj.get('longitude')}
-			except Exception:
-				pass
+			loc_data = project_locations.get(assignment.get('project')) or {}
 		
 		# Add if we found a location
 		if loc_data:
@@ -149,13 +389,86 @@ def get_assigned_forms():
 	return {
 		'forms': forms,
 		'projects': projects,
+		'templates': templates,
 		'farm_locations': farm_locations,
 		'assignments': assignments  # Include original assignments for backward compatibility
 	}
 
 
+def _get_sync_token():
+	"""
+	Return the token a client sends back as since on its next sync.
+	It trails the current time so changes committed by in-flight transactions are not skipped;
+	the few assignments re-sent because of the overlap are idempotent upserts.
+	"""
+	return str(add_to_date(now_datetime(), seconds=-SYNC_TOKEN_OVERLAP_SECONDS))
+
+
+def _parse_sync_token(token):
+	try:
+		return get_datetime(token)
+	except Exception:
+		frappe.throw(f"Invalid sync token '{token}'")
+
+
+def _get_removed_assignments(user, since, current_names):
+	"""Return the assignments that left the user's open list since a sync token."""
+	removed = {}
+	
+	# Completed or cancelled assignments are still owned by the user
+	for row in frappe.get_all(
+		'Form Assignment',
+		filters={
+			'user': user,
+			'status': ['not in', OPEN_ASSIGNMENT_STATUSES],
+			'modified': ['>', since]
+		},
+		fields=['name', 'status']
+	):
+		removed[row.name] = row.status
+	
+	# Reassigned and deleted assignments are only known from their tombstones
+	for row in frappe.get_all(
+		'Form Assignment Tombstone',
+		filters={'user': user, 'creation': ['>', since]},
+		fields=['assignment', 'reason'],
+		order_by='creation asc'
+	):
+		removed[row.assignment] = row.reason
+	
+	return [
+		{'name': name, 'reason': reason}
+		for name, reason in removed.items()
+		if name not in current_names
+	]
+
+
+def _get_tile_manifest(farm_locations, min_zoom, max_zoom, buffer_km):
+	"""
+	Merge the map tiles around every farm location into one deduplicated manifest.
+	Past MAX_MANIFEST_TILES the highest zooms are dropped and the manifest is flagged truncated.
+	"""
+	min_zoom, max_zoom = cint(min_zoom), min(cint(max_zoom), MAX_MANIFEST_ZOOM)
+	if not (0 <= min_zoom <= max_zoom):
+		frappe.throw(f"Invalid zoom range {min_zoom}-{max_zoom}")
+	buffer_km = min(max(flt(buffer_km), 0), MAX_MANIFEST_BUFFER_KM)
+
+	points = {(flt(loc['lat']), flt(loc['lng'])) for loc in farm_locations}
+	tiles, covered_zoom = geo.tile_manifest(points, buffer_km, min_zoom, max_zoom, MAX_MANIFEST_TILES)
+
+	return {
+		'min_zoom': min_zoom,
+		'max_zoom': covered_zoom,
+		'buffer_km': buffer_km,
+		'count': len(tiles),
+		'tiles': tiles,
+		'truncated': covered_zoom < max_zoom
+	}
+
+
 @frappe.whitelist()
-def get_doctype_fields(doctype, template=None):
+@encoding.negotiated
+def get_doctype_fields(doctype, template=None, etag=None):
 	"""
 	Get field metadata for a DocType.
 	For PGS Survey: if a template is specified, returns the dynamic template fields
@@ -165,9 +478,11 @@ def get_doctype_fields(doctype, template=None):
 	Args:
 		doctype (str): Name of the DocType
 		template (str): Optional. PGS Template name (used when doctype is 'PGS Survey')
+		etag (str): Optional. ETag header of the copy held by the client; If-None-Match works too
 
 	Returns:
-		list: List of field definitions
+		list: List of field definitions, sent with an ETag header.
+			A 304 response or {"unchanged": True, "etag"} when the client's copy is current.
 	"""
 	# Check if user has permission to access this DocType
 	if not frappe.has_permission(doctype, "read"):
@@ -175,14 +490,129 @@ def get_doctype_fields(doctype, template=None):
 
 	# --- PGS Survey: return dynamic template fields ---
 	if doctype == 'PGS Survey' and template:
+		not_modified = conditional.get_not_modified_response(_get_fields_etag(doctype, template), etag)
+		if not_modified:
+			return not_modified
+
 		return _get_pgs_template_fields(template)
 
 	# --- Standard DocType meta fields ---
+	fields_etag, fields = _get_standard_fields(doctype)
+	not_modified = conditional.get_not_modified_response(fields_etag, etag)
+	if not_modified:
+		return not_modified
+
+	return fields
+
+
+@frappe.whitelist()
+@encoding.negotiated
+def get_doctype_fields_batch(pairs, etags=None):
+	"""
+	Get the field definitions of many DocTypes and PGS Templates in one call,
+	e.g. everything referenced by a user's assignments at startup sync.
+
+	Args:
+		pairs (str|list): JSON list of [doctype, template] pairs (template may be null),
+			or of {doctype, template} dicts; duplicates are answered once
+		etags (str|dict): Optional. {key: etag} of definitions already held by the client
+
+	Returns:
+		dict: {
+			"fields": {key: list of field definitions},
+			"etags": {key: etag},
+			"unchanged": Keys whose etag matched; their fields are not sent again,
+			"errors": {key: message} for missing templates or DocTypes the user cannot read,
+				and {index: message} for entries of pairs that are not a pair or dict with a doctype
+		}
+		key is "doctype" or "doctype::template", as built by get_field_key
+	"""
+	if isinstance(pairs, str):
+		pairs = json.loads(pairs)
+	if isinstance(etags, str):
+		etags = json.loads(etags)
+	etags = etags or {}
+
+	requested = {}
+	invalid = {}
+	for index, pair in enumerate(pairs or []):
+		if isinstance(pair, dict):
+			doctype, template = pair.get('doctype'), pair.get('template')
+		elif isinstance(pair, list | tuple):
+			doctype, template = [*pair, None, None][:2]
+		else:
+			doctype = template = None
+
+		if not (doctype and isinstance(doctype, str)):
+			invalid[str(index)] = f"Invalid entry {pair!r}, expected [doctype, template] or {{doctype, template}}"
+			continue
+
+		template = template if doctype == 'PGS Survey' else None
+		requested[get_field_key(doctype, template)] = (doctype, template)
+
+	# One permission check per distinct DocType
+	readable = {
+		doctype for doctype in {doctype for doctype, _template in requested.values()}
+		if frappe.db.exists('DocType', doctype) and frappe.has_permission(doctype, 'read')
+	}
+
+	response = {'fields': {}, 'etags': {}, 'unchanged': [], 'errors': invalid}
+	for key, (doctype, template) in requested.items():
+		if doctype not in readable:
+			response['errors'][key] = f"No permission to access {doctype}"
+			continue
+
+		try:
+			if template:
+				fields_etag = _get_fields_etag(doctype, template)
+				fields = None if etags.get(key) == fields_etag else _get_pgs_template_fields(template)
+			else:
+				fields_etag, fields = _get_standard_fields(doctype)
+		except frappe.ValidationError as e:
+			response['errors'][key] = str(e)
+			frappe.clear_last_message()
+			continue
+
+		response['etags'][key] = fields_etag
+		if etags.get(key) == fields_etag:
+			response['unchanged'].append(key)
+		else:
+			response['fields'][key] = fields
+
+	return response
+
+
+def get_field_key(doctype, template=None):
+	"""Key of a DocType or PGS Template in batched field definition responses."""
+	return f'{doctype}::{template}' if template else doctype
+
+
+def _get_standard_fields(doctype):
+	"""
+	Return (etag, field definitions) of a standard DocType, limited to the fields
+	the current user's roles can read.
+	The serialized list is cached per DocType until the DocType, its Custom Fields
+	or Property Setters change; only the permission level filter runs per request.
+	"""
+	entry = cache.get_doctype_fields(doctype)
+	if not entry:
+		entry = {'etag': _get_fields_etag(doctype), 'fields': _get_meta_fields(doctype)}
+		cache.set_doctype_fields(doctype, entry)
+
+	levels = sorted(set(frappe.get_meta(doctype).get_permlevel_access('read')) | {0})
+	return (
+		conditional.make_etag(entry['etag'], *levels),
+		[field for permlevel, field in entry['fields'] if permlevel in levels]
+	)
+
+
+def _get_meta_fields(doctype):
+	"""Standard DocType meta fields as (permlevel, field definition) pairs, in the shape the mobile app renders."""
 	meta = frappe.get_meta(doctype)
 
 	fields = []
 	for field in meta.fields:
-		fields.append({
+		fields.append((field.permlevel or 0, {
 			'fieldname': field.fieldname,
 			'label': field.label,
 			'fieldtype': field.fieldtype,
@@ -195,275 +625,242 @@ def get_doctype_fields(doctype, template=None):
 			'default': field.default,
 			'length': field.length,
 			'precision': field.precision
-		})
+		}))
 
 	return fields
 
 
+def _get_fields_etag(doctype, template=None):
+	"""
+	Fingerprint field definitions: a template by its content hash, a DocType by the
+	modified timestamps of everything that shapes its meta.
+	"""
+	if doctype == 'PGS Survey' and template:
+		return conditional.make_etag('fields', doctype, template, get_template_schema(template).content_hash)
+
+	return conditional.make_etag(
+		'fields',
+		doctype,
+		frappe.db.get_value('DocType', doctype, 'modified'),
+		frappe.db.sql("""select max(modified) from `tabCustom Field` where dt = %s""", doctype)[0][0],
+		frappe.db.sql("""select max(modified) from `tabProperty Setter` where doc_type = %s""", doctype)[0][0]
+	)
+
+
 def _get_pgs_template_fields(template_name):
 	"""
 	Convert PGS Template items into standard Frappe field definitions
 	so the mobile app can render them like any other DocType form.
+	The converted list is part of the compiled template schema.
 	"""
-	if not frappe.db.exists('PGS Template', template_name):
-		frappe.throw(f"PGS Template '{template_name}' does not exist")
+	return get_template_schema(template_name).fields
 
-	template = frappe.get_doc('PGS Template', template_name)
 
-	if template.docstatus != 1:
-		frappe.throw(f"PGS Template '{template_name}' is not submitted")
+PGS_FEATURE_FIELDS = ['reference_name', 'field_label', 'project', 'center_lat', 'center_lng', 'area_hectares', 'geometry']
 
-	# Parse section order
-	section_order = []
-	try:
-		section_order = json.loads(template.section_order or '[]')
-	except Exception:
-		pass
-
-	# Group items by section
-	sections = {}
-	for item in template.items:
-		sec = item.section or 'General'
-		if sec not in sections:
-			sections[sec] = []
-		sections[sec].append(item)
-
-	# Build ordered list of sections
-	ordered_sections = []
-	for s in section_order:
-		if s in sections:
-			ordered_sections.append(s)
-	for s in sections:
-		if s not in ordered_sections:
-			ordered_sections.append(s)
-
-	# Map PGS field types to Frappe field types
-	type_map = {
-		# Data/Numeric types
-		'Data': 'Data',
-		'Int': 'Int',
-		'Float': 'Float',
-		'Currency': 'Currency',
-		'Percent': 'Float',
-		'Phone': 'Data',
-		# Text types
-		'Small Text': 'Small Text',
-		'Long Text': 'Long Text',
-		'Text': 'Text',
-		'Text Editor': 'Text Editor',
-		'Markdown Editor': 'Markdown Editor',
-		'HTML Editor': 'Text Editor',
-		'Code': 'Code',
-		'JSON': 'Code',
-		# Selection types
-		'Select': 'Select',
-		'Autocomplete': 'Autocomplete',
-		# Date/Time types
-		'Date': 'Date',
-		'Datetime': 'Datetime',
-		'Time': 'Time',
-		'Duration': 'Duration',
-		# Link types
-		'Link': 'Link',
-		'Dynamic Link': 'Dynamic Link',
-		# File/Media types
-		'Attachment': 'Attach',
-		'Attach Image': 'Attach Image',
-		'Signature': 'Signature',
-		# Special types
-		'Color': 'Color',
-		'Rating': 'Rating',
-		'Barcode': 'Data',
-		'Icon': 'Data',
-		'Password': 'Password',
-		'Geolocation': 'Geolocation',
-		'Read Only': 'Read Only',
-		# PGS-specific types
-		'Radio': 'Select',
-		'Checkbox': 'Check',
-		'Multi-Select': 'Small Text',
-		'Formula': 'Data',
-		# Layout types
-		'Section Break': 'Section Break',
-		'Column Break': 'Column Break',
-		'Tab Break': 'Tab Break',
-	}
 
-	fields = []
+def _get_nearby_polygons_from_pgs(
+	lat=None, lng=None, radius_km=5, limit=500, mode=None, cursor=None, zoom=None, tolerance=None
+):
+	"""
+	Return the Geolocation answers of submitted PGS Surveys.
+	Geometries, centers and projects are read pre-parsed from the Geo Feature table,
+	which is filled when a survey is submitted and cleared when it is cancelled.
+	Returns the same FeatureCollection format as get_nearby_polygons.
+	"""
+	next_cursor = None
+	geometry_field = _get_geometry_field_for_zoom(zoom)
+	fields = [f for f in PGS_FEATURE_FIELDS if f != 'geometry']
+	fields.append('geometry' if geometry_field == 'geometry' else f'{geometry_field} as geometry')
 
-	for section_name in ordered_sections:
-		# Insert a Section Break for each PGS section
-		fields.append({
-			'fieldname': f'section_{section_name.lower().replace(" ", "_")}',
-			'label': section_name,
-			'fieldtype': 'Section Break',
-			'options': None,
-			'reqd': 0,
-			'read_only': 0,
-			'hidden': 0,
-			'depends_on': None,
-			'description': None,
-			'default': None,
-			'length': 0,
-			'precision': None
-		})
+	if mode == 'radius':
+		rows, next_cursor = _query_radius('PGS Survey', lat, lng, radius_km, limit=limit, cursor=cursor, fields=fields)
+	else:
+		filters = {'reference_doctype': 'PGS Survey'}
 
-		for item in sections[section_name]:
-			frappe_type = type_map.get(item.field_type, 'Data')
-			fieldname = item.fieldname or item.field_label.lower().replace(' ', '_').replace('-', '_')
+		if lat and lng:
+			filters.update(_get_spatial_filters(lat, lng, radius_km))
 
-			# Determine options value based on field type
-			if item.field_type in ('Select', 'Radio', 'Multi-Select', 'Autocomplete'):
-				options_value = item.options
-			elif item.field_type in ('Link', 'Dynamic Link'):
-				options_value = item.link_doctype
-			else:
-				options_value = None
-
-			field_def = {
-				'fieldname': fieldname,
-				'label': item.field_label,
-				'fieldtype': frappe_type,
-				'options': options_value,
-				'reqd': item.is_mandatory,
-				'read_only': 1 if item.field_type in ('Formula', 'Read Only') else 0,
-				'hidden': 0,
-				'depends_on': item.display_depends_on or None,
-				'description': item.help_text or None,
-				'default': None,
-				'length': 0,
-				'precision': 2 if item.field_type in ('Currency', 'Percent') else None,
-				# Extra PGS metadata (ignored by mobile if unknown, useful for form rendering)
-				'pgs_field_type': item.field_type,
-				'pgs_section': item.section,
-				'pgs_formula': item.formula or None,
-				'pgs_mandatory_depends_on': item.mandatory_depends_on or None,
-			}
+		rows = frappe.get_all('Geo Feature', filters=filters, fields=fields, limit=limit)
 
-			fields.append(field_def)
+	features = []
+	for row in rows:
+		feature = {
+			"type": "Feature",
+			"id": row.reference_name,
+			"properties": {
+				"name": row.reference_name,
+				"owner_name": None,
+				"status": "submitted",
+				"area_hectares": row.area_hectares,
+				"project": row.project,
+				"center_lat": row.center_lat,
+				"center_lng": row.center_lng,
+				"field_label": row.field_label
+			},
+			"geometry": json.loads(row.geometry)
+		}
+		if tolerance:
+			feature["geometry"] = geo.simplify_geometry(feature["geometry"], flt(tolerance))
+		if mode == 'radius':
+			feature["properties"]["distance_km"] = round(row.distance_km, 3)
+		features.append(feature)
 
-	return fields
+	if mode == 'radius':
+		return {"type": "FeatureCollection", "features": features, "next_cursor": next_cursor}
+
+	return {"type": "FeatureCollection", "features": features}
 
 
-def _get_nearby_polygons_from_pgs(lat=None, lng=None, radius_km=5, limit=500):
+def _get_geometry_field_for_zoom(zoom):
+	"""Return the Geo Feature field holding the precomputed geometry for a zoom level."""
+	if zoom in (None, ''):
+		return 'geometry'
+	return geo.get_lod_field(cint(zoom))
+
+
+def _get_spatial_filters(lat, lng, radius_km):
+	"""Return Geo Feature filters selecting centers inside the search box, keyed on grid cells."""
+	min_lat, min_lng, max_lat, max_lng = geo.bounding_box(lat, lng, radius_km)
+
+	filters = {
+		'center_lat': ['between', [min_lat, max_lat]],
+		'center_lng': ['between', [min_lng, max_lng]]
+	}
+
+	cells = geo.grid_cells_for_bbox(min_lat, min_lng, max_lat, max_lng)
+	if cells:
+		filters['grid_cell'] = ['in', cells]
+
+	return filters
+
+
+def _get_indexed_names(doctype_name, lat, lng, radius_km, project_id=None, limit=500):
 	"""
-	Extract GeoJSON features from PGS Survey Items that have field_type 'Geolocation'.
-	Returns the same FeatureCollection format as get_nearby_polygons.
+	Look up documents whose indexed center lies within the search box
+	using the Geo Feature grid cells instead of scanning the DocType table.
 	"""
-	# Get all Geolocation items from submitted surveys
-	geo_items = frappe.get_all(
-		'PGS Survey Item',
-		filters={'field_type': 'Geolocation', 'reading_value': ['is', 'set']},
-		fields=['parent', 'field_label', 'reading_value'],
-		limit=limit
-	)
+	filters = {'reference_doctype': doctype_name}
+	filters.update(_get_spatial_filters(lat, lng, radius_km))
 
-	# Only keep items from submitted surveys
-	if geo_items:
-		submitted_surveys = set(frappe.get_all(
-			'PGS Survey',
-			filters={'name': ['in', list({item.parent for item in geo_items})], 'docstatus': 1},
-			pluck='name'
-		))
-	else:
-		submitted_surveys = set()
+	if project_id:
+		filters['project'] = project_id
 
-	features = []
-	for item in geo_items:
-		if item.parent not in submitted_surveys:
-			continue
+	return frappe.get_all('Geo Feature', filters=filters, pluck='reference_name', limit=limit)
 
-		try:
-			geojson_obj = json.loads(item.reading_value) if isinstance(item.reading_value, str) else item.reading_value
-		except (json.JSONDecodeError, TypeError):
-			continue
 
-		if not isinstance(geojson_obj, dict):
-			continue
+# Great-circle distance in km between the Geo Feature center and %(lat)s, %(lng)s
+HAVERSINE_DISTANCE_SQL = f"""2 * {geo.EARTH_RADIUS_KM} * asin(least(1, sqrt(
+	power(sin(radians(center_lat - %(lat)s) / 2), 2)
+	+ cos(radians(%(lat)s)) * cos(radians(center_lat)) * power(sin(radians(center_lng - %(lng)s) / 2), 2)
+)))"""
 
-		# Extract geometry
-		geometry = None
-		if geojson_obj.get('type') == 'FeatureCollection' and geojson_obj.get('features'):
-			geometry = geojson_obj['features'][0].get('geometry')
-		elif geojson_obj.get('type') == 'Feature':
-			geometry = geojson_obj.get('geometry')
-		else:
-			geometry = geojson_obj
 
-		if not geometry:
-			continue
+def _query_radius(doctype_name, lat, lng, radius_km, project_id=None, limit=500, cursor=None, fields=None):
+	"""
+	Return Geo Feature rows whose center lies within radius_km great-circle distance
+	of a point, nearest first, and the cursor of the next page (None on the last page).
+	Candidates come from the grid-cell index; haversine distance is only computed for them.
+	"""
+	limit = cint(limit)
+	values = {
+		'doctype_name': doctype_name,
+		'lat': float(lat),
+		'lng': float(lng),
+		'radius_km': float(radius_km),
+		'page_size': limit + 1
+	}
+	conditions = ['reference_doctype = %(doctype_name)s']
+	conditions.extend(_get_spatial_conditions(lat, lng, radius_km, values))
 
-		# Try to extract center point for bounding-box filtering
-		center_lat, center_lng = _extract_center_from_geometry(geometry)
+	if project_id:
+		conditions.append('project = %(project)s')
+		values['project'] = project_id
+
+	page_condition = ''
+	if cursor:
+		values['last_distance'], values['last_name'] = _decode_cursor(cursor)
+		page_condition = """and (distance_km > %(last_distance)s
+			or (distance_km = %(last_distance)s and name > %(last_name)s))"""
+
+	rows = frappe.db.sql(
+		f"""
+		select * from (
+			select name, {', '.join(fields or ['reference_name'])}, {HAVERSINE_DISTANCE_SQL} as distance_km
+			from `tabGeo Feature`
+			where {' and '.join(conditions)}
+		) candidates
+		where distance_km <= %(radius_km)s {page_condition}
+		order by distance_km, name
+		limit %(page_size)s
+		""",
+		values,
+		as_dict=True
+	)
 
-		if lat and lng and center_lat is not None and center_lng is not None:
-			lat_delta = float(radius_km) / 111
-			cos_lat = abs(float(lat)) * 0.017453
-			lng_delta = float(radius_km) / (111 * cos_lat) if cos_lat else float(radius_km) / 111
+	next_cursor = None
+	if len(rows) > limit:
+		rows = rows[:limit]
+		next_cursor = _encode_cursor([rows[-1].distance_km, rows[-1].name])
 
-			if not (float(lat) - lat_delta <= center_lat <= float(lat) + lat_delta and
-					float(lng) - lng_delta <= center_lng <= float(lng) + lng_delta):
-				continue
+	return rows, next_cursor
 
-		feature = {
-			"type": "Feature",
-			"id": item.parent,
-			"properties": {
-				"name": item.parent,
-				"owner_name": None,
-				"status": "submitted",
-				"area_hectares": None,
-				"project": None,
-				"center_lat": center_lat,
-				"center_lng": center_lng,
-				"field_label": item.field_label
-			},
-			"geometry": geometry
-		}
-		features.append(feature)
 
-	return {"type": "FeatureCollection", "features": features}
+def _get_spatial_conditions(lat, lng, radius_km, values, prefix=''):
+	"""
+	Return SQL conditions selecting Geo Feature centers inside the search box,
+	keyed on grid cells, and add their parameters to values.
+	"""
+	min_lat, min_lng, max_lat, max_lng = geo.bounding_box(lat, lng, radius_km)
+	values.update({
+		'min_lat': min_lat,
+		'max_lat': max_lat,
+		'min_lng': min_lng,
+		'max_lng': max_lng
+	})
+	conditions = [
+		f'{prefix}center_lat between %(min_lat)s and %(max_lat)s',
+		f'{prefix}center_lng between %(min_lng)s and %(max_lng)s'
+	]
 
+	cells = geo.grid_cells_for_bbox(min_lat, min_lng, max_lat, max_lng)
+	if cells:
+		conditions.append(f'{prefix}grid_cell in %(cells)s')
+		values['cells'] = tuple(cells)
 
-def _extract_center_from_geometry(geometry):
-	"""Extract an approximate center point from a GeoJSON geometry."""
+	return conditions
+
+
+def _encode_cursor(values):
+	"""Encode keyset pagination values as an opaque cursor string."""
+	return base64.urlsafe_b64encode(json.dumps(values, default=str).encode()).decode()
+
+
+def _decode_cursor(cursor):
+	"""Decode a cursor produced by _encode_cursor."""
 	try:
-		geo_type = geometry.get('type', '')
-		coords = geometry.get('coordinates')
-		if not coords:
-			return None, None
-
-		if geo_type == 'Point':
-			return coords[1], coords[0]  # GeoJSON is [lng, lat]
-
-		# For Polygon, LineString, etc. — average all coordinate points
-		flat_coords = []
-		_flatten_coords(coords, flat_coords)
-		if not flat_coords:
-			return None, None
-
-		avg_lng = sum(c[0] for c in flat_coords) / len(flat_coords)
-		avg_lat = sum(c[1] for c in flat_coords) / len(flat_coords)
-		return avg_lat, avg_lng
-	except (IndexError, TypeError, KeyError):
-		return None, None
-
-
-def _flatten_coords(coords, result):
-	"""Recursively flatten nested coordinate arrays into [lng, lat] pairs."""
-	if not coords:
-		return
-	if isinstance(coords[0], (int, float)):
-		result.append(coords)
-	else:
-		for item in coords:
-			_flatten_coords(item, result)
+		return json.loads(base64.urlsafe_b64decode(cursor.encode()))
+	except (ValueError, TypeError, AttributeError):
+		frappe.throw("Invalid cursor")
 
 
 @frappe.whitelist()
-def get_nearby_polygons(lat=None, lng=None, radius_km=5, project_id=None, limit=500, doctype_name=None):
+@encoding.negotiated
+def get_nearby_polygons(
+	lat=None,
+	lng=None,
+	radius_km=5,
+	project_id=None,
+	limit=500,
+	doctype_name=None,
+	mode=None,
+	cursor=None,
+	zoom=None,
+	tolerance=None
+):
 	"""
-	Get nearby farm polygons for overlap detection
+	Get nearby farm polygons for client-side display and overlap checks
+	(find_overlapping_polygons runs the overlap test on the server)
 	Returns GeoJSON FeatureCollection format
 	
 	Args:
@@ -473,10 +870,22 @@ def get_nearby_polygons(lat=None, lng=None, radius_km=5, project_id=None, limit=
 		project_id (str): Optional project filter
 		limit (int): Maximum number of results (default 500)
 		doctype_name (str): DocType to query
+		mode (str): Optional. 'radius' keeps features within the true great-circle radius,
+			sorted nearest first, each with a distance_km property, and adds a next_cursor
+		cursor (str): Optional. next_cursor of the previous page in radius mode
+		zoom (int): Optional. Map zoom level; serves the geometry simplified for that zoom band,
+			precomputed when the source document was saved
+		tolerance (float): Optional. Douglas-Peucker tolerance in degrees, applied on the fly
 	
 	Returns:
 		dict: GeoJSON FeatureCollection with polygon features
 	"""
+	if mode not in (None, '', 'bbox', 'radius'):
+		frappe.throw(f"Unsupported mode '{mode}'")
+
+	if mode == 'radius' and not (lat and lng):
+		frappe.throw("lat and lng are required in radius mode")
+
 	# If no doctype specified, return empty result
 	if not doctype_name:
 		return {
@@ -495,7 +904,7 @@ def get_nearby_polygons(lat=None, lng=None, radius_km=5, project_id=None, limit=
 	
 	# Handle PGS Survey: geolocation is stored in child table items
 	if doctype_name == 'PGS Survey':
-		return _get_nearby_polygons_from_pgs(lat, lng, radius_km, limit)
+		return _get_nearby_polygons_from_pgs(lat, lng, radius_km, limit, mode, cursor, zoom, tolerance)
 
 	# Build filters
 	filters = {}
@@ -536,16 +945,44 @@ def get_nearby_polygons(lat=None, lng=None, radius_km=5, project_id=None, limit=
 		if field_name in field_names and field_name != 'name':
 			fields.append(field_name)
 	
+	# Narrow to records whose indexed center lies in the search area.
+	# Served DocTypes without Geo Feature rows yet (e.g. skipped by the backfill) and DocTypes
+	# no Form Assignment uses, whose rows are not kept up to date, are scanned as before
+	# and filtered on their centers below; the index of a served DocType is rebuilt meanwhile
+	served = is_served(doctype_name)
+	spatial = bool(lat and lng)
+	indexed = spatial and is_indexed(doctype_name)
+	distances = {}
+	next_cursor = None
+	if indexed and mode == 'radius':
+		indexed_rows, next_cursor = _query_radius(doctype_name, lat, lng, radius_km, project_id, limit, cursor)
+		if not indexed_rows:
+			return {
+				"type": "FeatureCollection",
+				"features": [],
+				"next_cursor": None
+			}
+		distances = {row.reference_name: row.distance_km for row in indexed_rows}
+		filters['name'] = ['in', list(distances)]
+	elif indexed:
+		indexed_names = _get_indexed_names(doctype_name, lat, lng, radius_km, project_id, limit)
+		if not indexed_names:
+			return {
+				"type": "FeatureCollection",
+				"features": []
+			}
+		filters['name'] = ['in', indexed_names]
+
 	# Get records
 	records = frappe.get_all(
 		doctype_name,
 		filters=filters,
 		fields=fields,
-		limit=limit
+		limit=None if spatial and not indexed else limit
 	)
 	
-	# Build GeoJSON FeatureCollection
-	features = []
+	# Map records and parse their geometries
+	rows = []
 	
 	for record in records:
 		# Get mapped field values
@@ -554,22 +991,6 @@ def get_nearby_polygons(lat=None, lng=None, radius_km=5, project_id=None, limit=
 			if frappe_field in record:
 				mapped_data[pwa_field] = record[frappe_field]
 		
-		# Filter by bounding box if coordinates provided
-		if lat and lng and mapped_data.get('center_latitude') and mapped_data.get('center_longitude'):
-			lat_delta = float(radius_km) / 111  # ~111km per degree
-			lng_delta = float(radius_km) / (111 * abs(float(lat)) * 0.017453)
-			
-			min_lat = float(lat) - lat_delta
-			max_lat = float(lat) + lat_delta
-			min_lng = float(lng) - lng_delta
-			max_lng = float(lng) + lng_delta
-			
-			center_lat = mapped_data['center_latitude']
-			center_lng = mapped_data['center_longitude']
-			
-			if not (min_lat <= center_lat <= max_lat and min_lng <= center_lng <= max_lng):
-				continue
-		
 		# Parse GeoJSON geometry
 		geometry = None
 		geojson_field = mapped_data.get('polygon_geojson')
@@ -597,6 +1018,22 @@ def get_nearby_polygons(lat=None, lng=None, radius_km=5, project_id=None, limit=
 				# If parsing fails, skip this polygon
 				continue
 		
+		rows.append((mapped_data, geometry))
+	
+	# Compute centers and areas of the whole result set in one vectorized pass
+	metrics = geo.compute_metrics([geometry for _mapped_data, geometry in rows])
+	
+	# Build GeoJSON FeatureCollection
+	features = []
+	
+	for (mapped_data, geometry), metric in zip(rows, metrics, strict=True):
+		if metric:
+			if mapped_data.get('center_latitude') is None or mapped_data.get('center_longitude') is None:
+				mapped_data['center_latitude'] = metric['center_lat']
+				mapped_data['center_longitude'] = metric['center_lng']
+			if not mapped_data.get('area_hectares') and metric['area_hectares']:
+				mapped_data['area_hectares'] = round(metric['area_hectares'], 4)
+		
 		# Build GeoJSON Feature
 		feature = {
 			"type": "Feature",
@@ -615,6 +1052,45 @@ def get_nearby_polygons(lat=None, lng=None, radius_km=5, project_id=None, limit=
 		
 		features.append(feature)
 	
+	if spatial and not indexed:
+		features, distances, next_cursor = _filter_scanned_features(
+			features, lat, lng, radius_km, mode, cursor, limit
+		)
+		if features and served:
+			queue_rebuild(doctype_name)
+	
+	# Swap in the geometries precomputed for the requested zoom band
+	geometry_field = _get_geometry_field_for_zoom(zoom)
+	if geometry_field != 'geometry' and features and served:
+		simplified = dict(frappe.get_all(
+			'Geo Feature',
+			filters={
+				'reference_doctype': doctype_name,
+				'reference_name': ['in', [f['id'] for f in features]],
+				geometry_field: ['is', 'set']
+			},
+			fields=['reference_name', geometry_field],
+			as_list=True
+		))
+		for feature in features:
+			if feature['id'] in simplified:
+				feature['geometry'] = json.loads(simplified[feature['id']])
+	
+	if tolerance:
+		for feature in features:
+			feature['geometry'] = geo.simplify_geometry(feature['geometry'], flt(tolerance))
+	
+	# Radius mode: nearest first, with distances and the next page cursor
+	if mode == 'radius':
+		for feature in features:
+			feature['properties']['distance_km'] = round(distances[feature['id']], 3)
+		features.sort(key=lambda f: (distances[f['id']], f['id']))
+		return {
+			"type": "FeatureCollection",
+			"features": features,
+			"next_cursor": next_cursor
+		}
+	
 	# Return GeoJSON FeatureCollection
 	return {
 		"type": "FeatureCollection",
@@ -622,6 +1098,449 @@ def get_nearby_polygons(lat=None, lng=None, radius_km=5, project_id=None, limit=
 	}
 
 
+def _filter_scanned_features(features, lat, lng, radius_km, mode, cursor, limit):
+	"""
+	Apply the search area to the features of a DocType that has no Geo Feature rows,
+	using their stored or computed centers.
+	Returns (features, {name: distance_km} in radius mode, next_cursor).
+	"""
+	min_lat, min_lng, max_lat, max_lng = geo.bounding_box(lat, lng, radius_km)
+	inside = []
+	for feature in features:
+		center_lat = feature['properties']['center_lat']
+		center_lng = feature['properties']['center_lng']
+		if center_lat is None or center_lng is None:
+			# Kept like the original scan did, except in radius mode where no distance is known
+			if mode != 'radius':
+				inside.append(feature)
+		elif min_lat <= flt(center_lat) <= max_lat and min_lng <= flt(center_lng) <= max_lng:
+			inside.append(feature)
+
+	if mode != 'radius':
+		return inside[:cint(limit)], {}, None
+
+	candidates = []
+	for feature in inside:
+		properties = feature['properties']
+		distance = geo.haversine_km(lat, lng, properties['center_lat'], properties['center_lng'])
+		if distance <= flt(radius_km):
+			candidates.append((distance, feature['id']))
+	candidates.sort()
+
+	if cursor:
+		last_distance, last_name = _decode_cursor(cursor)
+		candidates = [c for c in candidates if c > (last_distance, last_name)]
+
+	page = candidates[:cint(limit)]
+	next_cursor = _encode_cursor(list(page[-1])) if len(candidates) > len(page) else None
+	distances = {name: distance for distance, name in page}
+	return [f for f in inside if f['id'] in distances], distances, next_cursor
+
+
+# Source fields read for the streamed feature properties, in order of preference
+STREAM_PROPERTY_FIELDS = {
+	'owner_name': ('owner_name',),
+	'status': ('status',),
+	'area_hectares': ('area_hectares', 'area'),
+}
+
+
+@frappe.whitelist()
+def stream_nearby_polygons(
+	doctype_name, lat=None, lng=None, radius_km=5, project_id=None, output_format='ndjson', zoom=None
+):
+	"""
+	Stream every matching polygon without building the FeatureCollection in memory.
+	Rows are read from an unbuffered server-side cursor over the Geo Feature table
+	and written out one by one. Only served DocTypes with index rows and PGS Surveys can be streamed.
+
+	Args:
+		doctype_name (str): DocType to query
+		lat (float): Optional center latitude
+		lng (float): Optional center longitude
+		radius_km (float): Radius in kilometers (default 5km)
+		project_id (str): Optional project filter
+		output_format (str): 'ndjson' for one GeoJSON Feature per line (default),
+			or 'geojson' for a chunked FeatureCollection
+		zoom (int): Optional. Map zoom level; streams the precomputed simplified geometries
+
+	Returns:
+		Response: Streaming application/x-ndjson or application/geo+json response
+	"""
+	if output_format not in ('ndjson', 'geojson'):
+		frappe.throw(f"Unsupported output format '{output_format}'")
+
+	if not frappe.db.exists("DocType", doctype_name):
+		frappe.throw(f"DocType '{doctype_name}' does not exist")
+
+	if not frappe.has_permission(doctype_name, "read"):
+		frappe.throw(f"No permission to access {doctype_name}", frappe.PermissionError)
+
+	# Only the Geo Feature rows are streamed, so refuse DocTypes whose rows are missing or stale
+	# instead of returning an empty stream; a served DocType's index is rebuilt meanwhile
+	if doctype_name != 'PGS Survey' and not is_indexed(doctype_name):
+		if not is_served(doctype_name):
+			frappe.throw(f"DocType '{doctype_name}' is not used in any Form Assignment and cannot be streamed")
+
+		queue_rebuild(doctype_name)
+		frappe.throw(f"The spatial index of '{doctype_name}' is being built, please try again later")
+
+	query, values = _get_stream_query(doctype_name, lat, lng, radius_km, project_id, zoom)
+	lines = _generate_feature_lines(query, values, output_format, doctype_name == 'PGS Survey')
+
+	return Response(
+		_stream_with_db(lines),
+		mimetype='application/x-ndjson' if output_format == 'ndjson' else 'application/geo+json',
+		headers={'X-Accel-Buffering': 'no'},
+		direct_passthrough=True
+	)
+
+
+def _get_stream_query(doctype_name, lat, lng, radius_km, project_id, zoom=None):
+	"""Build the Geo Feature query behind stream_nearby_polygons."""
+	values = {'doctype_name': doctype_name}
+	geometry_field = _get_geometry_field_for_zoom(zoom)
+	select = [
+		'gf.reference_name',
+		'gf.field_label',
+		'gf.project',
+		'gf.center_lat',
+		'gf.center_lng',
+		'gf.area_hectares as indexed_area_hectares',
+		f'gf.{geometry_field} as geometry'
+	]
+	join = ''
+
+	if doctype_name != 'PGS Survey':
+		meta = frappe.get_meta(doctype_name)
+		for prop, source_fields in STREAM_PROPERTY_FIELDS.items():
+			source_field = next((f for f in source_fields if meta.has_field(f)), None)
+			if source_field:
+				select.append(f'src.`{source_field}` as {prop}')
+		join = f'left join `tab{doctype_name}` src on src.name = gf.reference_name'
+
+	conditions = ['gf.reference_doctype = %(doctype_name)s', f'gf.{geometry_field} is not null']
+	if lat and lng:
+		conditions.extend(_get_spatial_conditions(lat, lng, radius_km, values, prefix='gf.'))
+	if project_id:
+		conditions.append('gf.project = %(project)s')
+		values['project'] = project_id
+
+	query = f"""
+		select {', '.join(select)}
+		from `tabGeo Feature` gf
+		{join}
+		where {' and '.join(conditions)}
+	"""
+	return query, values
+
+
+def _generate_feature_lines(query, values, output_format, is_pgs):
+	"""Yield the encoded features of a stream query, wrapped as a FeatureCollection for 'geojson'."""
+	if output_format == 'geojson':
+		yield '{"type":"FeatureCollection","features":[\n'
+
+	separator = ''
+	with frappe.db.unbuffered_cursor():
+		for row in frappe.db.sql(query, values, as_dict=True, as_iterator=True):
+			properties = {
+				"name": row.reference_name,
+				"owner_name": row.get('owner_name'),
+				"status": "submitted" if is_pgs else (row.get('status') or 'unverified'),
+				"area_hectares": row.get('area_hectares') or row.indexed_area_hectares,
+				"project": row.project,
+				"center_lat": row.center_lat,
+				"center_lng": row.center_lng
+			}
+			if is_pgs:
+				properties["field_label"] = row.field_label
+
+			feature = json.dumps(
+				{
+					"type": "Feature",
+					"id": row.reference_name,
+					"properties": properties,
+					"geometry": json.loads(row.geometry)
+				},
+				default=float,
+				separators=(',', ':')
+			)
+
+			if output_format == 'ndjson':
+				yield feature + '\n'
+			else:
+				yield separator + feature
+				separator = ',\n'
+
+	if output_format == 'geojson':
+		yield '\n]}\n'
+
+
+def _stream_with_db(generator):
+	"""
+	Run a streaming generator in its own site context and database connection.
+	Frappe destroys the request context before the response body is iterated; the new one
+	is destroyed however the stream ends, also when the client disconnects midway.
+	"""
+	site, sites_path = frappe.local.site, frappe.local.sites_path
+
+	def stream():
+		frappe.init(site, sites_path=sites_path)
+		try:
+			frappe.connect(set_admin_as_user=False)
+			yield from generator
+		finally:
+			frappe.destroy()
+
+	return stream()
+
+
+# Below this zoom a tile covers too much ground to draw single farms; it is served empty
+MIN_POLYGON_TILE_ZOOM = 8
+
+# Features drawn on one tile at most, largest first
+MAX_TILE_FEATURES = 5000
+
+
+@frappe.whitelist()
+def get_polygon_tile(z, x, y, doctype_name):
+	"""
+	Get the farm or PGS Survey geometries of one map tile as a Mapbox Vector Tile.
+	Tiles are cached on disk and invalidated when a polygon inside them is edited.
+	Tiles below MIN_POLYGON_TILE_ZOOM are empty; others hold up to MAX_TILE_FEATURES features.
+
+	Args:
+		z (int): Zoom level
+		x (int): Tile column
+		y (int): Tile row
+		doctype_name (str): DocType to draw
+
+	Returns:
+		Response: application/vnd.mapbox-vector-tile with one layer named after the DocType
+	"""
+	z, x, y = cint(z), cint(x), cint(y)
+	if not (tile_cache.MIN_TILE_ZOOM <= z <= tile_cache.MAX_TILE_ZOOM and 0 <= x < 2 ** z and 0 <= y < 2 ** z):
+		frappe.throw(f"Invalid tile {z}/{x}/{y}")
+
+	if not frappe.db.exists("DocType", doctype_name):
+		frappe.throw(f"DocType '{doctype_name}' does not exist")
+
+	if not frappe.has_permission(doctype_name, "read"):
+		frappe.throw(f"No permission to access {doctype_name}", frappe.PermissionError)
+
+	data = tile_cache.read_tile(doctype_name, z, x, y)
+	if data is None:
+		data = _build_polygon_tile(doctype_name, z, x, y)
+		tile_cache.write_tile(doctype_name, z, x, y, data)
+
+	return Response(data, mimetype='application/vnd.mapbox-vector-tile')
+
+
+def _build_polygon_tile(doctype_name, z, x, y):
+	"""Encode the largest Geo Feature geometries whose bounding box touches a tile."""
+	if z < MIN_POLYGON_TILE_ZOOM:
+		return mvt.encode_tile({}, z, x, y)
+
+	min_lat, min_lng, max_lat, max_lng = geo.tile_bounds(z, x, y)
+	geometry_field = geo.get_lod_field(z)
+
+	filters = {
+		'reference_doctype': doctype_name,
+		'min_lat': ['<=', max_lat],
+		'max_lat': ['>=', min_lat],
+		'min_lng': ['<=', max_lng],
+		'max_lng': ['>=', min_lng],
+		geometry_field: ['is', 'set']
+	}
+
+	rows = frappe.get_all(
+		'Geo Feature',
+		filters=filters,
+		fields=['reference_name', 'field_label', 'project', 'area_hectares', f'{geometry_field} as geometry'],
+		order_by='area_hectares desc',
+		limit=MAX_TILE_FEATURES
+	)
+
+	features = []
+	for row in rows:
+		properties = {
+			'name': row.reference_name,
+			'project': row.project,
+			'field_label': row.field_label,
+			'area_hectares': flt(row.area_hectares) if row.area_hectares is not None else None
+		}
+		features.append((json.loads(row.geometry), properties))
+
+	return mvt.encode_tile({frappe.scrub(doctype_name): features}, z, x, y)
+
+
+@frappe.whitelist()
+def find_overlapping_polygons(geometry, doctype_name, exclude_name=None, project_id=None, min_overlap_m2=1):
+	"""
+	Find the farms a candidate polygon overlaps, with the intersection areas
+
+	Args:
+		geometry (str|dict): GeoJSON Polygon or MultiPolygon (bare, Feature or FeatureCollection)
+		doctype_name (str): DocType to test against
+		exclude_name (str): Optional. Document to skip, e.g. the farm being edited
+		project_id (str): Optional project filter
+		min_overlap_m2 (float): Ignore overlaps smaller than this (default 1 m²)
+
+	Returns:
+		dict: {
+			"overlaps": List of {name, field_label, project, overlap_hectares,
+				overlap_percent, existing_overlap_percent}, largest first
+		}
+	"""
+	if not frappe.db.exists("DocType", doctype_name):
+		frappe.throw(f"DocType '{doctype_name}' does not exist")
+
+	if not frappe.has_permission(doctype_name, "read"):
+		frappe.throw(f"No permission to access {doctype_name}", frappe.PermissionError)
+
+	parsed = geo.parse_geometry(geometry)
+	if not parsed or parsed.get('type') not in overlap.AREAL_TYPES:
+		frappe.throw("geometry must be a GeoJSON Polygon or MultiPolygon")
+
+	return {
+		'overlaps': overlap.find_overlaps(parsed, doctype_name, exclude_name, project_id, flt(min_overlap_m2))
+	}
+
+
+# Bump when the layout of the offline bundle changes
+OFFLINE_BUNDLE_FORMAT = 1
+
+# Farm locations of a DocType closer than this many decimal degrees (about 100 m) share one polygon query
+OFFLINE_BUNDLE_LOCATION_PRECISION = 3
+
+
+@frappe.whitelist()
+def get_offline_bundle(radius_km=5, limit=500, version=None):
+	"""
+	Get everything a device needs for a field day in one gzip compressed JSON artifact:
+	the open assignments, the field definitions of every referenced DocType and PGS Template,
+	and the polygons around every farm location.
+	The bundle is cached per user and rebuilt only when its version changes.
+
+	Args:
+		radius_km (float): Polygon search radius around each farm location (default 5km)
+		limit (int): Maximum polygons per farm location (default 500)
+		version (str): Optional. version of the bundle held by the client; If-None-Match works too
+
+	Returns:
+		Response: application/gzip with an ETag header holding the version. The JSON inside is {
+			"format", "version", "generated_at", "sync_token",
+			"forms", "projects", "farm_locations", "assignments": As in get_assigned_forms,
+			"fields": {doctype: field definitions},
+			"template_fields": {pgs_template: field definitions},
+			"polygons": {doctype: GeoJSON FeatureCollection, deduplicated across locations}
+		}
+		A 304 response or {"unchanged": True, "etag"} when the client's copy is current.
+	"""
+	user = frappe.session.user
+	radius_km, limit = flt(radius_km), cint(limit)
+
+	references = frappe.get_all(
+		'Form Assignment',
+		filters={'user': user, 'status': ['in', OPEN_ASSIGNMENT_STATUSES]},
+		fields=['doctype_name', 'pgs_template'],
+		distinct=True
+	)
+	doctypes = sorted({
+		r.doctype_name for r in references
+		if r.doctype_name and frappe.db.exists('DocType', r.doctype_name)
+		and frappe.has_permission(r.doctype_name, 'read')
+	})
+	templates = sorted({r.pgs_template for r in references if r.pgs_template and 'PGS Survey' in doctypes})
+	# Cancelled templates have no definitions to bundle
+	templates = sorted(get_template_hashes(templates))
+
+	current_version = _get_offline_bundle_version(user, doctypes, templates, radius_km, limit)
+	not_modified = conditional.get_not_modified_response(current_version, version)
+	if not_modified:
+		return not_modified
+
+	data = cache.get_offline_bundle(user, current_version)
+	if data is None:
+		bundle = _build_offline_bundle(user, doctypes, templates, radius_km, limit)
+		bundle['version'] = current_version
+		data = gzip.compress(frappe.as_json(bundle, indent=None, separators=(',', ':')).encode())
+		cache.set_offline_bundle(user, current_version, data)
+
+	response = Response(data, mimetype='application/gzip')
+	response.headers['ETag'] = current_version
+	response.headers['Content-Disposition'] = 'attachment; filename="offline-bundle.json.gz"'
+	return response
+
+
+def _get_offline_bundle_version(user, doctypes, templates, radius_km, limit):
+	"""
+	Fingerprint the bundle from the assignment, field definition and polygon index versions.
+	The assignment version covers the referenced Projects, whose coordinates are the
+	fallback farm locations the polygons are searched around.
+	"""
+	parts = [OFFLINE_BUNDLE_FORMAT, _get_assignments_etag(user, radius_km, limit)]
+	parts += [_get_standard_fields(doctype)[0] for doctype in doctypes]
+	parts += [_get_fields_etag('PGS Survey', template) for template in templates]
+
+	if doctypes:
+		parts += frappe.db.sql(
+			"""select count(*), max(modified) from `tabGeo Feature` where reference_doctype in %s""",
+			[tuple(doctypes)]
+		)[0]
+
+	return conditional.make_etag('offline_bundle', *parts)
+
+
+def _build_offline_bundle(user, doctypes, templates, radius_km, limit):
+	assignments = frappe.get_all(
+		'Form Assignment',
+		filters={'user': user, 'status': ['in', OPEN_ASSIGNMENT_STATUSES]},
+		fields=ASSIGNMENT_FIELDS,
+		order_by='assigned_date desc'
+	)
+
+	bundle = {
+		'format': OFFLINE_BUNDLE_FORMAT,
+		'generated_at': now_datetime(),
+		# A cached bundle keeps its token; the next delta sync then re-sends a little more
+		'sync_token': _get_sync_token(),
+		**_build_assignment_payload(assignments),
+		'fields': {doctype: _get_standard_fields(doctype)[1] for doctype in doctypes},
+		'template_fields': {template: _get_pgs_template_fields(template) for template in templates},
+		'polygons': {}
+	}
+
+	# Polygons around every farm location, each feature once per DocType.
+	# Assignments of the same project share its location, so nearby locations are queried once
+	doctype_by_assignment = {a.name: a.doctype_name for a in assignments}
+	queried = set()
+	seen = set()
+	for location in bundle['farm_locations']:
+		doctype = doctype_by_assignment.get(location['id'])
+		if doctype not in doctypes:
+			continue
+
+		area = (
+			doctype,
+			round(flt(location['lat']), OFFLINE_BUNDLE_LOCATION_PRECISION),
+			round(flt(location['lng']), OFFLINE_BUNDLE_LOCATION_PRECISION)
+		)
+		if area in queried:
+			continue
+		queried.add(area)
+
+		collection = bundle['polygons'].setdefault(doctype, {'type': 'FeatureCollection', 'features': []})
+		result = get_nearby_polygons(location['lat'], location['lng'], radius_km, limit=limit, doctype_name=doctype)
+		for feature in result['features']:
+			key = (doctype, feature.get('id'), feature['properties'].get('field_label'))
+			if key not in seen:
+				seen.add(key)
+				collection['features'].append(feature)
+
+	return bundle
+
+
 @frappe.whitelist()
 def mark_assignment_in_progress(assignment_name):
 	"""
@@ -662,6 +1581,147 @@ def mark_assignment_completed(assignment_name):
 	return {'status': 'success'}
 
 
+# Upper bound on the transitions applied by one update_assignment_statuses call
+MAX_BULK_STATUS_UPDATES = 500
+
+
+@frappe.whitelist(methods=['POST'])
+def update_assignment_statuses(updates):
+	"""
+	Apply many assignment status transitions in one request and one transaction,
+	e.g. when a device comes back online with a day of finished visits.
+	Same rules as mark_assignment_in_progress and mark_assignment_completed:
+	only Pending assignments move to In Progress, and only the user's own assignments change.
+	Every change runs the Form Assignment validation; the rows are then written in bulk.
+
+	Args:
+		updates (str|list): JSON list of {name, status}; status is 'In Progress' or 'Completed'
+
+	Returns:
+		dict: {
+			"updated": Number of assignments changed,
+			"results": [{name, status: 'success' | 'unchanged' | 'error', message}] in request order
+		}
+	"""
+	if isinstance(updates, str):
+		updates = json.loads(updates)
+
+	if not isinstance(updates, list):
+		frappe.throw("updates must be a list of {name, status}")
+
+	if len(updates) > MAX_BULK_STATUS_UPDATES:
+		frappe.throw(f"At most {MAX_BULK_STATUS_UPDATES} updates can be sent at once")
+
+	user = frappe.session.user
+	names = {u.get('name') for u in updates if isinstance(u, dict) and u.get('name')}
+	current = {
+		row.name: row
+		for row in frappe.get_all(
+			'Form Assignment',
+			filters={'name': ['in', list(names)]},
+			fields=['*']
+		)
+	} if names else {}
+
+	results = []
+	changes = {}
+	for update in updates:
+		name = update.get('name') if isinstance(update, dict) else None
+		status = update.get('status') if isinstance(update, dict) else None
+		row = current.get(name)
+
+		if status not in ('In Progress', 'Completed'):
+			results.append({'name': name, 'status': 'error', 'message': f"Unsupported status '{status}'"})
+		elif not row:
+			results.append({'name': name, 'status': 'error', 'message': f"Form Assignment '{name}' does not exist"})
+		elif row.user != user:
+			results.append({'name': name, 'status': 'error', 'message': "You can only update your own assignments"})
+		elif row.status == status or (status == 'In Progress' and row.status != 'Pending'):
+			results.append({'name': name, 'status': 'unchanged'})
+		else:
+			doc = frappe.get_doc({**row, 'doctype': 'Form Assignment', 'status': status})
+			if status == 'Completed':
+				doc.completed_date = frappe.utils.today()
+
+			error = _run_validation(doc)
+			if error:
+				results.append({'name': name, 'status': 'error', 'message': error})
+				continue
+
+			previous = changes[name][0] if name in changes else frappe.get_doc({**row, 'doctype': 'Form Assignment'})
+			changes[name] = (previous, doc)
+			row.update({'status': doc.status, 'completed_date': doc.completed_date})
+			results.append({'name': name, 'status': 'success'})
+
+	if changes:
+		_apply_status_changes(changes)
+		cache.clear_assigned_forms(user)
+		realtime.publish_assignment_changes(
+			user,
+			changed=[
+				{field: doc.get(field) for field in ASSIGNMENT_FIELDS}
+				for _previous, doc in changes.values()
+				if doc.status in OPEN_ASSIGNMENT_STATUSES
+			],
+			removed=[
+				{'name': doc.name, 'reason': doc.status}
+				for _previous, doc in changes.values()
+				if doc.status not in OPEN_ASSIGNMENT_STATUSES
+			]
+		)
+
+	return {'updated': len(changes), 'results': results}
+
+
+def _run_validation(doc):
+	"""Run the validate method and hooks of a changed document; return the error message, if any."""
+	try:
+		doc.run_method('validate')
+	except frappe.ValidationError as e:
+		frappe.clear_last_message()
+		return str(e)
+
+	return None
+
+
+def _apply_status_changes(changes):
+	"""
+	Write {name: (previous doc, changed doc)} with one UPDATE per target status.
+	Version rows are built like a save builds them and bulk inserted,
+	so the change history stays complete without a save per document.
+	"""
+	now = frappe.utils.now()
+	user = frappe.session.user
+
+	by_status = {}
+	for _previous, doc in changes.values():
+		by_status.setdefault((doc.status, doc.completed_date), []).append(doc.name)
+
+	for (status, completed_date), names in by_status.items():
+		frappe.db.sql(
+			"""update `tabForm Assignment`
+			set status = %(status)s, completed_date = %(completed_date)s, modified = %(now)s, modified_by = %(user)s
+			where name in %(names)s""",
+			{'status': status, 'completed_date': completed_date, 'now': now, 'user': user, 'names': names}
+		)
+
+	versions = []
+	for previous, doc in changes.values():
+		version = frappe.new_doc('Version')
+		if version.update_version_info(previous, doc):
+			versions.append((
+				frappe.generate_hash(length=10), now, now, user, user,
+				version.ref_doctype, version.docname, version.data
+			))
+
+	if versions:
+		frappe.db.bulk_insert(
+			'Version',
+			fields=['name', 'creation', 'modified', 'owner', 'modified_by', 'ref_doctype', 'docname', 'data'],
+			values=versions
+		)
+
+
 @frappe.whitelist()
 def submit_pgs_survey(template, values, assignment_name=None):
 	"""
@@ -680,40 +1740,34 @@ def submit_pgs_survey(template, values, assignment_name=None):
 	if isinstance(values, str):
 		values = json.loads(values)
 
-	if not frappe.db.exists('PGS Template', template):
-		frappe.throw(f"PGS Template '{template}' does not exist")
-
-	# Get template details
-	template_doc = frappe.get_doc('PGS Template', template)
-
-	if template_doc.docstatus != 1:
-		frappe.throw(f"PGS Template '{template}' is not submitted")
+	# Compiled template (throws if it does not exist or is not submitted)
+	schema = get_template_schema(template)
 
 	# Create the PGS Survey
 	survey = frappe.new_doc('PGS Survey')
 	survey.template = template
-	survey.category = template_doc.category or ''
+	survey.category = schema.category or ''
 
 	if assignment_name:
 		survey.form_assignment = assignment_name
 
 	# Populate items from template and fill in values
-	for item in template_doc.items:
-		fieldname = item.fieldname or item.field_label.lower().replace(' ', '_').replace('-', '_')
-
-		row = survey.append('items', {
-			'section': item.section,
-			'field_label': item.field_label,
-			'fieldname': item.fieldname,
-			'field_type': item.field_type,
-			'is_mandatory': item.is_mandatory,
-			'formula': item.formula,
-			'options': item.options,
-			'link_doctype': item.link_doctype if item.field_type in ('Link', 'Dynamic Link') else None,
-			'help_text': item.help_text,
-			'display_depends_on': item.display_depends_on,
-			'mandatory_depends_on': item.mandatory_depends_on,
-			'reading_value': str(values.get(fieldname, '')) if values.get(fieldname) is not None else '',
+	for item in schema.items:
+		value = values.get(item['key'])
+
+		survey.append('items', {
+			'section': item['section'],
+			'field_label': item['field_label'],
+			'fieldname': item['fieldname'],
+			'field_type': item['field_type'],
+			'is_mandatory': item['is_mandatory'],
+			'formula': item['formula'],
+			'options': item['options'],
+			'link_doctype': item['link_doctype'] if item['field_type'] in ('Link', 'Dynamic Link') else None,
+			'help_text': item['help_text'],
+			'display_depends_on': item['display_depends_on'],
+			'mandatory_depends_on': item['mandatory_depends_on'],
+			'reading_value': str(value) if value is not None else '',
 		})
 
 	# Save first (triggers validation + formula calculation)
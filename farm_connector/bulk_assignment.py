@@ -0,0 +1,294 @@
+"""
+High-volume Form Assignment creation for campaign launches
+Rows are validated against each distinct user, DocType and PGS Template once,
+named from one reserved block of the assignment series and bulk inserted in batches,
+skipping the per-document validate and hooks of Document.insert.
+"""
+
+import json
+import re
+
+import frappe
+from frappe.model.naming import parse_naming_series
+from frappe.utils import getdate, now, today
+from frappe.utils.csvutils import read_csv_content
+
+from farm_connector import cache, realtime
+from farm_connector.farm_connector.doctype.form_assignment.form_assignment import (
+	ASSIGNMENT_FIELDS,
+	OPEN_ASSIGNMENT_STATUSES,
+)
+from farm_connector.farm_connector.doctype.geo_feature.geo_feature import add_served_doctypes
+
+# Columns accepted in the CSV header or the row dicts
+ASSIGNMENT_COLUMNS = (
+	'user',
+	'doctype_name',
+	'pgs_template',
+	'description',
+	'assigned_date',
+	'due_date',
+	'status',
+	'project',
+	'location',
+)
+
+# Rows written per bulk insert; progress is reported after each batch
+BATCH_SIZE = 500
+
+# Larger requests run as a background job
+MAX_SYNC_ROWS = 500
+
+# How long the result of a background job can be fetched
+JOB_STATUS_EXPIRY = 24 * 60 * 60
+
+JOB_STATUS_KEY = 'farm_connector:bulk_assignment'
+
+SERIES_PATTERN = re.compile(r'\{(#+)\}')
+
+
+@frappe.whitelist(methods=['POST'])
+def create_assignments(assignments=None, csv_content=None, file_url=None):
+	"""
+	Create many Form Assignments at once from a list, CSV text or an uploaded CSV file.
+
+	Args:
+		assignments (str|list): JSON list of dicts with the ASSIGNMENT_COLUMNS keys
+		csv_content (str): CSV text with a header row naming the columns
+		file_url (str): URL of an uploaded CSV File
+
+	Returns:
+		dict: Up to MAX_SYNC_ROWS rows: {created, errors: [{row, message}]}.
+			Larger inputs: {job_id, total}; progress is published as the realtime event
+			'farm_connector_bulk_assignment' and the result is read with get_job_status.
+	"""
+	frappe.has_permission('Form Assignment', 'create', throw=True)
+
+	rows = _read_rows(assignments, csv_content, file_url)
+	if not rows:
+		frappe.throw("No assignments to create")
+
+	if len(rows) <= MAX_SYNC_ROWS:
+		return insert_assignments(rows)
+
+	job_id = f'bulk_assignment::{frappe.generate_hash(length=10)}'
+	_set_job_status(job_id, {'status': 'Queued', 'total': len(rows), 'processed': 0})
+	frappe.enqueue(insert_assignments, queue='long', timeout=3600, rows=rows, tracking_id=job_id)
+	return {'job_id': job_id, 'total': len(rows)}
+
+
+@frappe.whitelist()
+def get_job_status(job_id):
+	"""
+	Return {status, total, processed, created, errors} of a background bulk creation.
+	status is Queued, Running, Completed or Failed; a failed job also carries its error.
+	"""
+	status = frappe.cache.get_value(f'{JOB_STATUS_KEY}:{job_id}')
+	if not status or status.get('owner') != frappe.session.user:
+		frappe.throw(f"Bulk assignment job '{job_id}' not found", frappe.DoesNotExistError)
+	return status
+
+
+def insert_assignments(rows, tracking_id=None):
+	"""
+	Validate rows and bulk insert the valid ones; return {created, errors}.
+	As a background job (tracking_id set) every batch is committed, which also releases
+	the lock on the series row, and progress is reported after it; if the job crashes,
+	its status becomes Failed with the error, keeping the batches committed so far.
+	"""
+	if not tracking_id:
+		return _insert_assignments(rows)
+
+	try:
+		return _insert_assignments(rows, tracking_id)
+	except Exception as e:
+		frappe.db.rollback()
+		_report_failure(tracking_id, str(e))
+		raise
+
+
+def _insert_assignments(rows, tracking_id=None):
+	valid, errors = _validate_rows(rows)
+	_report_progress(tracking_id, len(rows), len(errors), 0, errors)
+
+	created = 0
+	for start in range(0, len(valid), BATCH_SIZE):
+		batch = valid[start:start + BATCH_SIZE]
+		_insert_batch(batch)
+		created += len(batch)
+
+		if tracking_id:
+			frappe.db.commit()
+		_report_progress(tracking_id, len(rows), len(errors) + created, created, errors)
+
+	return {'created': created, 'errors': errors}
+
+
+def _read_rows(assignments=None, csv_content=None, file_url=None):
+	if assignments:
+		rows = json.loads(assignments) if isinstance(assignments, str) else assignments
+		if not isinstance(rows, list):
+			frappe.throw("assignments must be a list")
+		return [row if isinstance(row, dict) else {} for row in rows]
+
+	if file_url:
+		file_doc = frappe.get_doc('File', {'file_url': file_url})
+		file_doc.check_permission('read')
+		csv_content = file_doc.get_content()
+
+	if not csv_content:
+		return []
+
+	table = read_csv_content(csv_content)
+	if not table:
+		return []
+
+	header = [str(column).strip() for column in table[0]]
+	rows = []
+	for line, values in enumerate(table[1:], start=2):
+		if not any(values):
+			continue
+		if len(values) > len(header):
+			frappe.throw(f"CSV line {line} has more values than the header has columns")
+		# Trailing empty cells may be left out
+		values = [*values, *[None] * (len(header) - len(values))]
+		rows.append(dict(zip(header, values, strict=True)))
+	return rows
+
+
+def _validate_rows(rows):
+	"""Split rows into insertable dicts and [{row, message}] errors, with one query per distinct reference."""
+	users = _existing('User', {row.get('user') for row in rows}, {'enabled': 1})
+	doctypes = _existing('DocType', {row.get('doctype_name') for row in rows})
+	templates = _existing('PGS Template', {row.get('pgs_template') for row in rows}, {'docstatus': 1})
+	statuses = frappe.get_meta('Form Assignment').get_options('status').split('\n')
+
+	valid = []
+	errors = []
+	for index, row in enumerate(rows, start=1):
+		row = {column: (row.get(column) or None) for column in ASSIGNMENT_COLUMNS}
+		row['status'] = row['status'] or 'Pending'
+		row['assigned_date'] = row['assigned_date'] or today()
+
+		try:
+			if row['user'] not in users:
+				raise frappe.ValidationError(f"User '{row['user']}' does not exist or is disabled")
+			if row['doctype_name'] not in doctypes:
+				raise frappe.ValidationError(f"DocType '{row['doctype_name']}' does not exist")
+			if row['doctype_name'] == 'PGS Survey' and not row['pgs_template']:
+				raise frappe.ValidationError("PGS Template is required for PGS Survey assignments")
+			if row['pgs_template'] and row['pgs_template'] not in templates:
+				raise frappe.ValidationError(f"PGS Template '{row['pgs_template']}' does not exist or is not submitted")
+			if row['status'] not in statuses:
+				raise frappe.ValidationError(f"Invalid status '{row['status']}'")
+
+			row['assigned_date'] = getdate(row['assigned_date'])
+			row['due_date'] = getdate(row['due_date']) if row['due_date'] else None
+			if row['location'] and not isinstance(row['location'], str):
+				row['location'] = json.dumps(row['location'])
+		except Exception as e:
+			errors.append({'row': index, 'message': str(e)})
+			continue
+
+		valid.append(row)
+
+	return valid, errors
+
+
+def _existing(doctype, names, filters=None):
+	names = [name for name in names if name]
+	if not names:
+		return set()
+	return set(frappe.get_all(doctype, filters={'name': ['in', names], **(filters or {})}, pluck='name'))
+
+
+def _insert_batch(rows):
+	timestamp = now()
+	user = frappe.session.user
+	completed_date = today()
+	names = _reserve_names(len(rows))
+
+	frappe.db.bulk_insert(
+		'Form Assignment',
+		fields=['name', 'creation', 'modified', 'owner', 'modified_by', *ASSIGNMENT_COLUMNS, 'completed_date'],
+		values=[
+			(
+				name, timestamp, timestamp, user, user,
+				*(row[column] for column in ASSIGNMENT_COLUMNS),
+				completed_date if row['status'] == 'Completed' else None
+			)
+			for name, row in zip(names, rows, strict=True)
+		]
+	)
+
+	cache.clear_assigned_forms(*{row['user'] for row in rows})
+	add_served_doctypes({row['doctype_name'] for row in rows})
+
+	# One push per user and batch with the new open assignments
+	changed_by_user = {}
+	for name, row in zip(names, rows, strict=True):
+		if row['status'] in OPEN_ASSIGNMENT_STATUSES:
+			assignment = {**row, 'name': name}
+			changed_by_user.setdefault(row['user'], []).append({f: assignment[f] for f in ASSIGNMENT_FIELDS})
+	for assigned_user, changed in changed_by_user.items():
+		realtime.publish_assignment_changes(assigned_user, changed=changed)
+
+
+def _reserve_names(count):
+	"""
+	Take a consecutive block of the Form Assignment autoname series in one update.
+	The series row is resolved the way format: autonames resolve each {###} part.
+	"""
+	name_format = frappe.get_meta('Form Assignment').autoname.split(':', 1)[-1]
+	digits = len(SERIES_PATTERN.search(name_format).group(1))
+
+	series = []
+	parse_naming_series(['#' * digits], doctype='Form Assignment', number_generator=lambda key, _d: series.append(key) or '')
+	key = series[0]
+
+	current = frappe.db.sql('select `current` from `tabSeries` where `name` = %s for update', key)
+	if current:
+		start = current[0][0]
+		frappe.db.sql('update `tabSeries` set `current` = `current` + %s where `name` = %s', (count, key))
+	else:
+		start = 0
+		frappe.db.sql('insert into `tabSeries` (`name`, `current`) values (%s, %s)', (key, count))
+
+	return [
+		SERIES_PATTERN.sub(str(number).zfill(digits), name_format)
+		for number in range(start + 1, start + count + 1)
+	]
+
+
+def _report_progress(job_id, total, processed, created, errors):
+	if not job_id:
+		return
+
+	_set_job_status(job_id, {
+		'status': 'Completed' if processed >= total else 'Running',
+		'total': total,
+		'processed': processed,
+		'created': created,
+		'errors': errors
+	})
+	frappe.publish_realtime(
+		'farm_connector_bulk_assignment',
+		{'job_id': job_id, 'total': total, 'processed': processed, 'created': created, 'errors': len(errors)},
+		user=frappe.session.user
+	)
+
+
+def _report_failure(job_id, error):
+	status = frappe.cache.get_value(f'{JOB_STATUS_KEY}:{job_id}') or {}
+	status.update({'status': 'Failed', 'error': error})
+	_set_job_status(job_id, status)
+	frappe.publish_realtime(
+		'farm_connector_bulk_assignment',
+		{'job_id': job_id, 'status': 'Failed', 'error': error},
+		user=frappe.session.user
+	)
+
+
+def _set_job_status(job_id, status):
+	status['owner'] = frappe.session.user
+	frappe.cache.set_value(f'{JOB_STATUS_KEY}:{job_id}', status, expires_in_sec=JOB_STATUS_EXPIRY)
@@ -0,0 +1,248 @@
+"""
+Shared Redis caches for the Farm Connector API
+"""
+
+import pickle
+
+import frappe
+from redis.exceptions import WatchError
+
+PROJECT_LOCATION_KEY = 'farm_connector:project_location'
+ASSIGNED_FORMS_KEY = 'farm_connector:assigned_forms'
+ASSIGNED_FORMS_GENERATION_KEY = 'farm_connector:assigned_forms_generation'
+DOCTYPE_FIELDS_KEY = 'farm_connector:doctype_fields'
+SERVED_DOCTYPES_KEY = 'farm_connector:served_doctypes'
+
+
+def get_project_locations(project_names):
+	"""
+	Return {project: {'lat', 'lng'}} for the given projects that have coordinates.
+	Served from a shared cache read with one HMGET; all misses are resolved with a single query
+	and written back in one pipeline. Values are pickled like frappe.cache.hset stores them.
+	"""
+	project_names = [project for project in set(project_names) if project]
+	if not project_names:
+		return {}
+
+	key = frappe.cache.make_key(PROJECT_LOCATION_KEY)
+	locations = {}
+	missing = []
+
+	for project, cached in zip(project_names, frappe.cache.hmget(key, project_names), strict=True):
+		if cached is None:
+			missing.append(project)
+		else:
+			location = pickle.loads(cached)
+			if location:
+				locations[project] = location
+
+	if missing:
+		fetched = _fetch_project_locations(missing)
+		pipeline = frappe.cache.pipeline()
+		for project in missing:
+			# Cache projects without coordinates too, as an empty dict
+			location = fetched.get(project, {})
+			pipeline.hset(key, project, pickle.dumps(location))
+			if location:
+				locations[project] = location
+		pipeline.execute()
+
+	return locations
+
+
+def _fetch_project_locations(project_names):
+	if not frappe.db.exists('DocType', 'Project'):
+		return {}
+
+	meta = frappe.get_meta('Project')
+	if not (meta.has_field('latitude') and meta.has_field('longitude')):
+		return {}
+
+	projects = frappe.get_all(
+		'Project',
+		filters={'name': ['in', project_names]},
+		fields=['name', 'latitude', 'longitude']
+	)
+
+	return {
+		p.name: {'lat': p.latitude, 'lng': p.longitude}
+		for p in projects
+		if p.latitude and p.longitude
+	}
+
+
+def clear_project_location(doc, method=None, *args, **kwargs):
+	"""
+	doc_events hook: forget the cached location of a changed, renamed or deleted Project,
+	and the cached assignment lists and offline bundles of the users assigned to it,
+	whose versions include the Project's modified timestamp
+	"""
+	projects = [doc.name]
+	if method == 'after_rename' and args:
+		projects.append(args[0])
+
+	users = frappe.get_all(
+		'Form Assignment', filters={'project': ['in', projects]}, distinct=True, pluck='user'
+	)
+	clear_assigned_forms(*users)
+	clear_offline_bundles(*users)
+
+	if method == 'on_update' and not (doc.has_value_changed('latitude') or doc.has_value_changed('longitude')):
+		return
+
+	for project in projects:
+		frappe.cache.hdel(PROJECT_LOCATION_KEY, project)
+
+
+def get_served_doctypes():
+	"""Return the DocTypes used in Form Assignments, whose polygons are served to devices."""
+	return frappe.cache.get_value(SERVED_DOCTYPES_KEY, generator=_fetch_served_doctypes)
+
+
+def _fetch_served_doctypes():
+	return frappe.get_all('Form Assignment', distinct=True, pluck='doctype_name')
+
+
+def clear_served_doctypes():
+	frappe.cache.delete_value(SERVED_DOCTYPES_KEY)
+	frappe.db.after_commit.add(lambda: frappe.cache.delete_value(SERVED_DOCTYPES_KEY))
+
+
+OFFLINE_BUNDLE_KEY = 'farm_connector:offline_bundle'
+
+
+def get_offline_bundle(user, version):
+	"""Return the cached compressed offline bundle of a user if it is still at this version."""
+	cached = frappe.cache.hget(OFFLINE_BUNDLE_KEY, user)
+	if cached and cached.get('version') == version:
+		return cached['data']
+	return None
+
+
+def set_offline_bundle(user, version, data):
+	"""Keep one compressed offline bundle per user; older versions are overwritten."""
+	frappe.cache.hset(OFFLINE_BUNDLE_KEY, user, {'version': version, 'data': data})
+
+
+def clear_offline_bundles(*users):
+	"""Forget the cached offline bundles of users, now and again after commit."""
+	_clear_user_entries(OFFLINE_BUNDLE_KEY, users)
+
+
+def get_assigned_forms_generation(user):
+	"""
+	Return the generation of a user's cached assignment lists, bumped by every clear.
+	Read it before reading the database and pass it to set_assigned_forms.
+	"""
+	key = frappe.cache.make_key(ASSIGNED_FORMS_GENERATION_KEY)
+	return frappe.cache.hmget(key, [user])[0]
+
+
+def get_assigned_forms(user, params):
+	"""Return the cached full-sync get_assigned_forms response of a user for these parameters, or None."""
+	key = frappe.cache.make_key(ASSIGNED_FORMS_KEY)
+	cached = frappe.cache.hmget(key, [user])[0]
+	return pickle.loads(cached).get(_params_key(params)) if cached else None
+
+
+def set_assigned_forms(user, params, response, generation):
+	"""
+	Cache a full-sync response built after reading generation.
+	Nothing is written if the user's lists were cleared since, as the response may predate the change.
+	"""
+	key = frappe.cache.make_key(ASSIGNED_FORMS_KEY)
+	generation_key = frappe.cache.make_key(ASSIGNED_FORMS_GENERATION_KEY)
+
+	with frappe.cache.pipeline() as pipeline:
+		try:
+			pipeline.watch(key, generation_key)
+			if pipeline.hmget(generation_key, [user])[0] != generation:
+				return
+
+			cached = pipeline.hmget(key, [user])[0]
+			cached = pickle.loads(cached) if cached else {}
+			cached[_params_key(params)] = response
+
+			pipeline.multi()
+			pipeline.hset(key, user, pickle.dumps(cached))
+			pipeline.execute()
+		except WatchError:
+			# Cleared or written by another request meanwhile; the next request caches its own result
+			pass
+
+
+def clear_assigned_forms(*users):
+	"""
+	Forget the cached assignment lists of users and bump their generations, now and again after commit.
+	A request that read the generation before the commit then cannot cache its stale result.
+	"""
+	users = {user for user in users if user}
+	if not users:
+		return
+
+	key = frappe.cache.make_key(ASSIGNED_FORMS_KEY)
+	generation_key = frappe.cache.make_key(ASSIGNED_FORMS_GENERATION_KEY)
+
+	def clear():
+		pipeline = frappe.cache.pipeline()
+		for user in users:
+			pipeline.hincrby(generation_key, user, 1)
+			pipeline.hdel(key, user)
+		pipeline.execute()
+
+	clear()
+	frappe.db.after_commit.add(clear)
+
+
+def _clear_user_entries(key, users):
+	users = {user for user in users if user}
+	if not users:
+		return
+
+	def clear():
+		for user in users:
+			frappe.cache.hdel(key, user)
+
+	clear()
+	frappe.db.after_commit.add(clear)
+
+
+def _params_key(params):
+	return '|'.join(str(param) for param in params)
+
+
+def get_doctype_fields(doctype):
+	"""Return the cached {etag, fields} of a standard DocType, or None."""
+	return frappe.cache.hget(DOCTYPE_FIELDS_KEY, doctype)
+
+
+def set_doctype_fields(doctype, entry):
+	frappe.cache.hset(DOCTYPE_FIELDS_KEY, doctype, entry)
+
+
+def clear_doctype_fields(doc, method=None, *args, **kwargs):
+	"""doc_events hook: forget the field definitions of a DocType whose meta changed"""
+	doctypes = {
+		{
+			'DocType': doc.name,
+			'Custom Field': doc.get('dt'),
+			'Property Setter': doc.get('doc_type')
+		}.get(doc.doctype)
+	}
+	if method == 'after_rename' and args:
+		doctypes.add(args[0])
+	doctypes.discard(None)
+	if not doctypes:
+		return
+
+	def clear():
+		for doctype in doctypes:
+			frappe.cache.hdel(DOCTYPE_FIELDS_KEY, doctype)
+
+	clear()
+	frappe.db.after_commit.add(clear)
+
+
+def clear_all_doctype_fields():
+	"""after_migrate hook: DocTypes synced from files may not run their doc_events"""
+	frappe.cache.delete_value(DOCTYPE_FIELDS_KEY)
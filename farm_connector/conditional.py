@@ -0,0 +1,58 @@
+"""
+Conditional GET support for the read endpoints used by the mobile app
+An endpoint derives a cheap version fingerprint from a few aggregate queries and
+skips building and serializing its payload when the client already holds it.
+"""
+
+import hashlib
+
+import frappe
+from werkzeug.wrappers import Response
+
+
+def make_etag(*parts):
+	"""Return a quoted entity tag for a version fingerprint."""
+	digest = hashlib.md5('|'.join(str(part) for part in parts).encode(), usedforsecurity=False)
+	return f'"{digest.hexdigest()}"'
+
+
+def get_not_modified_response(etag, client_etag=None):
+	"""
+	Return the short-circuit response when the client already has this version, else None.
+
+	Args:
+		etag (str): Current entity tag of the resource
+		client_etag (str): Optional. Entity tag sent as a request parameter
+
+	Returns:
+		Response | dict | None: 304 for a matching If-None-Match header,
+			{unchanged, etag} for a matching etag parameter
+	"""
+	set_etag_header(etag)
+
+	if client_etag and _matches(client_etag, etag):
+		return {'unchanged': True, 'etag': etag}
+
+	request = getattr(frappe.local, 'request', None)
+	if request and request.method in ('GET', 'HEAD'):
+		if_none_match = request.headers.get('If-None-Match')
+		if if_none_match and _matches(if_none_match, etag):
+			response = Response(status=304)
+			response.headers['ETag'] = etag
+			return response
+
+	return None
+
+
+def set_etag_header(etag):
+	"""Send the entity tag with the normal JSON response, where Frappe supports extra headers."""
+	headers = getattr(frappe.local, 'response_headers', None)
+	if headers is not None:
+		headers['ETag'] = etag
+
+
+def _matches(header_value, etag):
+	if header_value.strip() == '*':
+		return True
+	candidates = {tag.strip().removeprefix('W/') for tag in header_value.split(',')}
+	return etag in candidates or etag.strip('"') in candidates
@@ -0,0 +1,139 @@
+"""
+Compact MessagePack encoding of API responses
+Clients that send Accept: application/msgpack get the response as MessagePack instead of JSON:
+- lists of records are sent as {"__columns__": keys, "__rows__": [values]}, the columns being
+  the union of the records' keys in first-seen order and a missing key sent as null
+- GeoJSON coordinates are quantized to integers of 10^-COORDINATE_PRECISION degrees,
+  each position after the first in a ring or line stored as the delta to the previous one;
+  such geometries carry "precision": COORDINATE_PRECISION
+- the body is gzip compressed when the client accepts it
+Without the msgpack package every client gets the normal JSON response.
+"""
+
+import datetime
+import decimal
+import functools
+import gzip
+import inspect
+
+import frappe
+from werkzeug.wrappers import Response
+
+try:
+	import msgpack
+except ImportError:
+	msgpack = None
+
+MSGPACK_MIMETYPES = ('application/msgpack', 'application/x-msgpack', 'application/vnd.msgpack')
+
+# Decimal places kept in quantized coordinates (10^-6 degrees is about 0.1 m)
+COORDINATE_PRECISION = 6
+
+# Smaller bodies are not worth compressing
+MIN_COMPRESS_BYTES = 1024
+
+GEOMETRY_TYPES = ('Point', 'MultiPoint', 'LineString', 'MultiLineString', 'Polygon', 'MultiPolygon')
+
+
+def negotiated(fn):
+	"""
+	Decorator for whitelisted methods: send the result as compact MessagePack when the client asks for it.
+	Internal calls of the method and Response results are passed through unchanged.
+	"""
+
+	@functools.wraps(fn)
+	def wrapper(*args, **kwargs):
+		result = fn(*args, **kwargs)
+		if isinstance(result, Response) or not _wants_msgpack(fn):
+			return result
+		return encode_response(result)
+
+	# Frappe matches request arguments against the signature of the whitelisted function
+	wrapper.__signature__ = inspect.signature(fn)
+	return wrapper
+
+
+def encode_response(result):
+	"""Return a MessagePack Response holding {"message": result}, gzip compressed if accepted."""
+	data = msgpack.packb({'message': compact(result)}, default=_default, use_bin_type=True)
+
+	response = Response(mimetype='application/msgpack')
+	response.headers['Vary'] = 'Accept, Accept-Encoding'
+
+	accept_encoding = frappe.local.request.headers.get('Accept-Encoding', '')
+	if len(data) >= MIN_COMPRESS_BYTES and 'gzip' in accept_encoding:
+		data = gzip.compress(data, compresslevel=6)
+		response.headers['Content-Encoding'] = 'gzip'
+
+	response.set_data(data)
+	return response
+
+
+def compact(value):
+	"""Rewrite a response value into its compact form."""
+	if isinstance(value, dict):
+		if value.get('type') in GEOMETRY_TYPES and isinstance(value.get('coordinates'), list):
+			return quantize_geometry(value)
+		return {key: compact(item) for key, item in value.items()}
+
+	if isinstance(value, list | tuple):
+		if len(value) > 1 and all(isinstance(item, dict) for item in value):
+			# Records of one list may differ in a few keys (e.g. the fields of a template and its section breaks)
+			columns = list(dict.fromkeys(key for item in value for key in item))
+			return {
+				'__columns__': columns,
+				'__rows__': [[compact(item.get(key)) for key in columns] for item in value]
+			}
+		return [compact(item) for item in value]
+
+	return value
+
+
+def quantize_geometry(geometry):
+	"""Return a GeoJSON geometry with delta-encoded integer coordinates."""
+	scale = 10 ** COORDINATE_PRECISION
+	try:
+		coordinates = _quantize(geometry['coordinates'], scale)
+	except (TypeError, ValueError):
+		return geometry
+
+	return {**geometry, 'coordinates': coordinates, 'precision': COORDINATE_PRECISION}
+
+
+def _quantize(coords, scale):
+	if not coords or not isinstance(coords[0], list | tuple):
+		# A single position
+		return [round(float(c) * scale) for c in coords]
+
+	if isinstance(coords[0][0], list | tuple):
+		return [_quantize(part, scale) for part in coords]
+
+	# A sequence of positions: first absolute, then deltas
+	previous = None
+	result = []
+	for position in coords:
+		current = [round(float(c) * scale) for c in position]
+		result.append(current if previous is None else [c - p for c, p in zip(current, previous, strict=True)])
+		previous = current
+	return result
+
+
+def _wants_msgpack(fn):
+	request = getattr(frappe.local, 'request', None)
+	if not request or msgpack is None:
+		return False
+
+	# Only the method the client called is re-encoded, not endpoints it calls internally
+	if not request.path.rstrip('/').endswith(f'{fn.__module__}.{fn.__name__}'):
+		return False
+
+	accept = request.headers.get('Accept', '')
+	return any(mimetype in accept for mimetype in MSGPACK_MIMETYPES)
+
+
+def _default(value):
+	if isinstance(value, datetime.datetime | datetime.date | datetime.time | datetime.timedelta):
+		return str(value)
+	if isinstance(value, decimal.Decimal):
+		return float(value)
+	return str(value)
@@ -4,6 +4,38 @@
 import frappe
 from frappe.model.document import Document
 
+from farm_connector import cache, realtime
+from farm_connector.farm_connector.doctype.form_assignment_tombstone.form_assignment_tombstone import (
+	add_tombstone,
+)
+from farm_connector.farm_connector.doctype.geo_feature.geo_feature import add_served_doctypes
+
+# Assignment statuses still shown on the device
+OPEN_ASSIGNMENT_STATUSES = ["Pending", "In Progress"]
+
+# Form Assignment fields sent to the device
+ASSIGNMENT_FIELDS = [
+	"name",
+	"doctype_name",
+	"description",
+	"assigned_date",
+	"due_date",
+	"status",
+	"project",
+	"location",
+	"pgs_template",
+]
+
+# Composite indexes matching the sync queries: (index name, columns)
+# - open assignments of a user, newest first (get_assigned_forms)
+# - assignments of a user changed since a sync token, and the list fingerprint
+# - keyset pages of a user's assignments by (assigned_date, name)
+INDEXES = (
+	("user_status_assigned_date_index", ["user", "status", "assigned_date"]),
+	("user_modified_index", ["user", "modified"]),
+	("user_assigned_date_name_index", ["user", "assigned_date", "name"]),
+)
+
 
 class FormAssignment(Document):
 	def validate(self):
@@ -16,3 +48,38 @@ class FormAssignment(Document):
 		"""Update completed date when status changes to Completed"""
 		if self.status == "Completed" and not self.completed_date:
 			self.db_set("completed_date", frappe.utils.today())
+
+		# Let the previous user's devices drop a reassigned assignment on their next delta sync
+		previous = self.get_doc_before_save()
+		if previous and previous.user != self.user:
+			add_tombstone(self.name, previous.user, "Reassigned")
+			realtime.publish_assignment_changes(
+				previous.user, removed=[{"name": self.name, "reason": "Reassigned"}]
+			)
+
+		if self.status in OPEN_ASSIGNMENT_STATUSES:
+			realtime.publish_assignment_changes(
+				self.user, changed=[{field: self.get(field) for field in ASSIGNMENT_FIELDS}]
+			)
+		elif previous and previous.user == self.user and previous.status in OPEN_ASSIGNMENT_STATUSES:
+			realtime.publish_assignment_changes(self.user, removed=[{"name": self.name, "reason": self.status}])
+
+		cache.clear_assigned_forms(self.user, previous and previous.user)
+		add_served_doctypes([self.doctype_name])
+
+	def on_trash(self):
+		add_tombstone(self.name, self.user, "Deleted")
+		realtime.publish_assignment_changes(self.user, removed=[{"name": self.name, "reason": "Deleted"}])
+		cache.clear_assigned_forms(self.user)
+
+	def after_rename(self, old, new, merge=False):
+		cache.clear_assigned_forms(self.user)
+
+
+def on_doctype_update():
+	add_indexes()
+
+
+def add_indexes():
+	for index_name, columns in INDEXES:
+		frappe.db.add_index("Form Assignment", columns, index_name=index_name)
@@ -1,8 +1,15 @@
 # Copyright (c) 2026, mohamed elsawy and Contributors
 # See license.txt
 
-# import frappe
+import re
+from unittest.mock import patch
+
+import frappe
 from frappe.tests import IntegrationTestCase
+from frappe.utils import add_days, now_datetime, today
+
+from farm_connector import api, cache
+from farm_connector.farm_connector.doctype.form_assignment.form_assignment import INDEXES
 
 # On IntegrationTestCase, the doctype test records and all
 # link-field test record dependencies are recursively loaded
@@ -10,6 +17,13 @@ from frappe.tests import IntegrationTestCase
 EXTRA_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 IGNORE_TEST_RECORD_DEPENDENCIES = []  # eg. ["User"]
 
+# Fixture size: enough rows per user that the optimizer prefers an index over a scan
+FIXTURE_USERS = 40
+FIXTURE_ROWS_PER_USER = 100
+FIXTURE_STATUSES = ("Pending", "In Progress", "Completed", "Cancelled")
+
+FROM_TABLE = re.compile(r"\bfrom\s+`([^`]+)`", re.IGNORECASE)
+
 
 class TestFormAssignment(IntegrationTestCase):
 	"""
@@ -17,4 +31,98 @@ class TestFormAssignment(IntegrationTestCase):
 	Can be run with: bench --site [sitename] run-tests --doctype "Form Assignment"
 	"""
 
-	pass
+	def setUp(self):
+		if frappe.db.db_type != "mariadb":
+			self.skipTest("EXPLAIN output is only checked on MariaDB")
+
+		insert_fixture_assignments()
+		cache.clear_assigned_forms(frappe.session.user)
+
+	def tearDown(self):
+		frappe.db.rollback()
+		cache.clear_assigned_forms(frappe.session.user)
+
+	def test_sync_queries_use_indexes(self):
+		since = str(add_days(now_datetime(), -1))
+		first_page = api.get_assigned_forms(page_size=20)
+		calls = {
+			"full sync": lambda: api.get_assigned_forms(),
+			"delta sync": lambda: api.get_assigned_forms(since=since),
+			"first page": lambda: api.get_assigned_forms(page_size=20),
+			"next page": lambda: api.get_assigned_forms(page_size=20, cursor=first_page["next_cursor"]),
+			"delta page": lambda: api.get_assigned_forms(since=since, page_size=20),
+		}
+
+		for label, call in calls.items():
+			queries = capture_assignment_queries(call)
+			self.assertTrue(queries, f"{label} ran no Form Assignment query")
+			for query, values in queries:
+				with self.subTest(call=label, query=query):
+					plan = frappe.db.sql(f"explain {query}", values, as_dict=True)
+					table_scans = [row for row in plan if row.get("type") == "ALL"]
+					self.assertFalse(table_scans, f"{label} query does a full table scan: {plan}")
+
+	def test_keyset_page_query_can_use_assigned_date_name_index(self):
+		first_page = api.get_assigned_forms(page_size=20)
+		self.assertTrue(first_page["next_cursor"])
+
+		queries = capture_assignment_queries(
+			lambda: api.get_assigned_forms(page_size=20, cursor=first_page["next_cursor"])
+		)
+		page_queries = [(q, v) for q, v in queries if "order by assigned_date desc, name desc" in q]
+		self.assertEqual(len(page_queries), 1)
+
+		query, values = page_queries[0]
+		plan = frappe.db.sql(f"explain {query}", values, as_dict=True)
+		possible_keys = (plan[0].get("possible_keys") or "").split(",")
+		self.assertIn("user_assigned_date_name_index", possible_keys, plan)
+		self.assertNotEqual(plan[0].get("type"), "ALL", plan)
+
+	def test_indexes_exist(self):
+		for index_name, _columns in INDEXES:
+			with self.subTest(index=index_name):
+				self.assertTrue(frappe.db.has_index("tabForm Assignment", index_name))
+
+
+def insert_fixture_assignments():
+	"""Insert assignments for the session user among those of other users, without committing."""
+	users = [frappe.session.user] + [f"fixture-{i}@example.com" for i in range(FIXTURE_USERS - 1)]
+	timestamp = now_datetime()
+	values = [
+		(
+			f"FA-TEST-{u:03d}-{i:04d}",
+			timestamp,
+			add_days(timestamp, -(i % 7)),
+			"Administrator",
+			"Administrator",
+			user,
+			"ToDo",
+			FIXTURE_STATUSES[i % len(FIXTURE_STATUSES)],
+			add_days(today(), -(i % 30)),
+		)
+		for u, user in enumerate(users)
+		for i in range(FIXTURE_ROWS_PER_USER)
+	]
+	frappe.db.bulk_insert(
+		"Form Assignment",
+		fields=["name", "creation", "modified", "owner", "modified_by", "user", "doctype_name", "status", "assigned_date"],
+		values=values,
+	)
+
+
+def capture_assignment_queries(call):
+	"""Run an API call and return the (query, values) of the selects it ran on Form Assignment."""
+	queries = []
+	sql = frappe.db.sql
+
+	def recording_sql(query, values=(), *args, **kwargs):
+		text = str(query)
+		match = FROM_TABLE.search(text)
+		if text.lstrip().lower().startswith("select") and match and match.group(1) == "tabForm Assignment":
+			queries.append((text, values))
+		return sql(query, values, *args, **kwargs)
+
+	with patch.object(frappe.db, "sql", recording_sql):
+		call()
+
+	return queries
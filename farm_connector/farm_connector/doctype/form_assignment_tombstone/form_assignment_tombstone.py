@@ -0,0 +1,36 @@
+# Copyright (c) 2026, mohamed elsawy and contributors
+# For license information, please see license.txt
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import add_days, now_datetime
+
+# Delta sync tokens older than this fall back to a full sync
+RETENTION_DAYS = 30
+
+
+class FormAssignmentTombstone(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index('Form Assignment Tombstone', ['user', 'creation'])
+
+
+def add_tombstone(assignment, user, reason):
+	"""Record that an assignment left a user's list."""
+	frappe.get_doc({
+		'doctype': 'Form Assignment Tombstone',
+		'assignment': assignment,
+		'user': user,
+		'reason': reason
+	}).insert(ignore_permissions=True)
+
+
+def get_retention_horizon():
+	return add_days(now_datetime(), -RETENTION_DAYS)
+
+
+def clear_old_tombstones():
+	"""Scheduled daily: drop tombstones no delta sync can ask for any more"""
+	frappe.db.delete('Form Assignment Tombstone', {'creation': ['<', get_retention_horizon()]})
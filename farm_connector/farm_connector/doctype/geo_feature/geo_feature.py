@@ -0,0 +1,431 @@
+# Copyright (c) 2026, mohamed elsawy and contributors
+# For license information, please see license.txt
+
+import json
+
+import frappe
+from frappe.model.document import Document
+from frappe.utils import flt
+
+from farm_connector import cache, geo, tile_cache
+
+# Fields that may hold a farm geometry, in order of preference
+GEOMETRY_FIELDS = ('polygon', 'location', 'polygon_geojson', 'geojson', 'geometry')
+
+# Explicit center coordinate fields, in order of preference
+CENTER_FIELDS = (('center_latitude', 'center_longitude'), ('latitude', 'longitude'))
+
+# App DocTypes that carry a geometry field but are not farm features
+EXCLUDED_DOCTYPES = {
+	'Geo Feature',
+	'Form Assignment',
+	'PGS Survey',
+	'PGS Survey Item',
+	'PGS Template',
+	'PGS Template Section',
+}
+
+# Geo Feature columns built by make_features
+FEATURE_FIELDS = [
+	'reference_name',
+	'project',
+	'field_label',
+	'grid_cell',
+	'center_lat',
+	'center_lng',
+	'min_lat',
+	'min_lng',
+	'max_lat',
+	'max_lng',
+	'area_hectares',
+	'geometry',
+	*(fieldname for _max_zoom, fieldname in geo.LOD_BANDS),
+]
+
+# Index of the bounding box intersection queries of the tile and overlap endpoints
+BBOX_INDEX_COLUMNS = ['reference_doctype', 'min_lat', 'max_lat', 'min_lng', 'max_lng']
+
+INDEX_FIELDS = ['name', 'creation', 'modified', 'owner', 'modified_by', 'reference_doctype', *FEATURE_FIELDS]
+
+
+class GeoFeature(Document):
+	pass
+
+
+def on_doctype_update():
+	frappe.db.add_index('Geo Feature', ['reference_doctype', 'grid_cell'])
+	frappe.db.add_index('Geo Feature', ['reference_doctype', 'reference_name'])
+	add_bbox_index()
+
+
+def add_bbox_index():
+	frappe.db.add_index('Geo Feature', BBOX_INDEX_COLUMNS)
+
+
+def get_geometry_field(doctype):
+	"""Return the geometry field indexed for a DocType, or None if it is not indexed."""
+	if doctype in EXCLUDED_DOCTYPES:
+		return None
+
+	meta = frappe.get_meta(doctype)
+	if meta.istable or meta.issingle or meta.is_virtual:
+		return None
+
+	for fieldname in GEOMETRY_FIELDS:
+		if meta.has_field(fieldname):
+			return fieldname
+
+	return None
+
+
+def is_served(doctype):
+	"""Return True if a DocType is used in Form Assignments and has a geometry field to index."""
+	return doctype in cache.get_served_doctypes() and bool(get_geometry_field(doctype))
+
+
+def has_index(doctype):
+	"""Return True if any Geo Feature rows exist for a DocType."""
+	return bool(frappe.db.exists('Geo Feature', {'reference_doctype': doctype}))
+
+
+def is_indexed(doctype):
+	"""
+	Return True if a DocType can be answered from its Geo Feature rows.
+	Only served DocTypes are kept up to date by the doc_events; rows of any other are stale.
+	"""
+	return is_served(doctype) and has_index(doctype)
+
+
+def add_served_doctypes(doctypes):
+	"""Start indexing DocTypes that are used in a Form Assignment for the first time."""
+	new_doctypes = set(doctypes) - set(cache.get_served_doctypes())
+	if not new_doctypes:
+		return
+
+	cache.clear_served_doctypes()
+	for doctype in new_doctypes:
+		if doctype and get_geometry_field(doctype):
+			queue_rebuild(doctype)
+
+
+def get_source_fields(doctype, geometry_field):
+	"""Return the fields of a DocType needed to build its index rows."""
+	meta = frappe.get_meta(doctype)
+	fields = ['name', geometry_field]
+	for fieldname in ('project', *(f for pair in CENTER_FIELDS for f in pair)):
+		if meta.has_field(fieldname):
+			fields.append(fieldname)
+	return fields
+
+
+def make_features(entries):
+	"""
+	Return index rows for many geometries, computing their metrics in one vectorized pass.
+	Each entry holds reference_name and geometry, and optionally center_lat, center_lng,
+	project and field_label. Entries without a usable location are dropped.
+	"""
+	metrics = geo.compute_metrics([entry.get('geometry') for entry in entries])
+
+	features = []
+	for entry, metric in zip(entries, metrics, strict=True):
+		center_lat = entry.get('center_lat')
+		center_lng = entry.get('center_lng')
+		if center_lat is None or center_lng is None:
+			if not metric:
+				continue
+			center_lat, center_lng = metric['center_lat'], metric['center_lng']
+
+		bbox = metric or {'min_lat': center_lat, 'min_lng': center_lng, 'max_lat': center_lat, 'max_lng': center_lng}
+		geometry = entry.get('geometry')
+
+		feature = {
+			'reference_name': entry['reference_name'],
+			'project': entry.get('project'),
+			'field_label': entry.get('field_label'),
+			'grid_cell': geo.grid_cell(center_lat, center_lng),
+			'center_lat': center_lat,
+			'center_lng': center_lng,
+			'min_lat': bbox['min_lat'],
+			'min_lng': bbox['min_lng'],
+			'max_lat': bbox['max_lat'],
+			'max_lng': bbox['max_lng'],
+			'area_hectares': metric['area_hectares'] if metric else None,
+			'geometry': _dump_geometry(geometry),
+		}
+
+		# Precompute the simplified geometry of every zoom band
+		for max_zoom, fieldname in geo.LOD_BANDS:
+			feature[fieldname] = _dump_geometry(geo.simplify_geometry(geometry, geo.pixel_degrees(max_zoom)))
+
+		features.append(feature)
+
+	return features
+
+
+def _dump_geometry(geometry):
+	return json.dumps(geometry, separators=(',', ':')) if geometry else None
+
+
+def build_features(records, geometry_field):
+	"""Return the index rows of farm records, preferring their explicit center fields."""
+	entries = []
+	for record in records:
+		entry = {
+			'reference_name': record.get('name'),
+			'geometry': geo.parse_geometry(record.get(geometry_field)),
+			'project': record.get('project'),
+		}
+		for lat_field, lng_field in CENTER_FIELDS:
+			if record.get(lat_field) and record.get(lng_field):
+				entry['center_lat'] = flt(record.get(lat_field))
+				entry['center_lng'] = flt(record.get(lng_field))
+				break
+		entries.append(entry)
+
+	return make_features(entries)
+
+
+def get_pgs_entries(survey_name, items, project=None):
+	"""Return the geometry entries of the Geolocation answers of a PGS Survey."""
+	entries = []
+	for item in items:
+		if item.get('field_type') != 'Geolocation' or not item.get('reading_value'):
+			continue
+
+		geometry = geo.parse_geometry(item.get('reading_value'))
+		if geometry:
+			entries.append({
+				'reference_name': survey_name,
+				'geometry': geometry,
+				'project': project,
+				'field_label': item.get('field_label'),
+			})
+
+	return entries
+
+
+def write_features(doctype, features, replace_names=None, invalidate_tiles=True):
+	"""Bulk insert index rows, first removing the rows of replace_names."""
+	if replace_names:
+		delete_features(doctype, replace_names)
+
+	if not features:
+		return
+
+	now = frappe.utils.now()
+	user = frappe.session.user
+	values = [
+		(
+			frappe.generate_hash(length=10),
+			now,
+			now,
+			user,
+			user,
+			doctype,
+			*(feature[fieldname] for fieldname in FEATURE_FIELDS)
+		)
+		for feature in features
+	]
+	frappe.db.bulk_insert('Geo Feature', fields=INDEX_FIELDS, values=values)
+
+	if invalidate_tiles:
+		tile_cache.invalidate_bboxes(
+			doctype, [(f['min_lat'], f['min_lng'], f['max_lat'], f['max_lng']) for f in features]
+		)
+
+
+def delete_features(doctype, reference_names):
+	"""Remove the index rows of documents and invalidate the tiles they were drawn on."""
+	tile_cache.invalidate_bboxes(doctype, get_feature_bboxes(doctype, reference_names))
+	frappe.db.delete('Geo Feature', {'reference_doctype': doctype, 'reference_name': ['in', reference_names]})
+
+
+def get_feature_bboxes(doctype, reference_names):
+	return frappe.get_all(
+		'Geo Feature',
+		filters={'reference_doctype': doctype, 'reference_name': ['in', reference_names]},
+		fields=['min_lat', 'min_lng', 'max_lat', 'max_lng'],
+		as_list=True
+	)
+
+
+def rebuild_index(doctype, batch_size=1000):
+	"""
+	Rebuild the spatial index of every record of a served DocType. Returns the number of indexed features.
+	Other DocTypes are not indexed, as their rows would never be updated.
+	"""
+	if not is_served(doctype):
+		return 0
+
+	geometry_field = get_geometry_field(doctype)
+
+	fields = get_source_fields(doctype, geometry_field)
+	frappe.db.delete('Geo Feature', {'reference_doctype': doctype})
+	tile_cache.clear_doctype(doctype)
+
+	count = 0
+	last_name = ''
+	while True:
+		records = frappe.get_all(
+			doctype,
+			filters={'docstatus': ['<', 2], 'name': ['>', last_name]},
+			fields=fields,
+			order_by='name asc',
+			limit=batch_size
+		)
+		if not records:
+			break
+
+		features = build_features(records, geometry_field)
+		write_features(doctype, features, invalidate_tiles=False)
+		count += len(features)
+		last_name = records[-1].name
+
+	return count
+
+
+def rebuild_pgs_index(batch_size=1000):
+	"""Rebuild the index of every submitted PGS Survey. Returns the number of indexed features."""
+	frappe.db.delete('Geo Feature', {'reference_doctype': 'PGS Survey'})
+	tile_cache.clear_doctype('PGS Survey')
+
+	count = 0
+	last_name = ''
+	while True:
+		surveys = frappe.get_all(
+			'PGS Survey',
+			filters={'docstatus': 1, 'name': ['>', last_name]},
+			fields=['name', 'form_assignment'],
+			order_by='name asc',
+			limit=batch_size
+		)
+		if not surveys:
+			break
+
+		items_by_survey = {}
+		for item in frappe.get_all(
+			'PGS Survey Item',
+			filters={
+				'parenttype': 'PGS Survey',
+				'parent': ['in', [s.name for s in surveys]],
+				'field_type': 'Geolocation'
+			},
+			fields=['parent', 'field_type', 'field_label', 'reading_value']
+		):
+			items_by_survey.setdefault(item.parent, []).append(item)
+
+		projects = get_assignment_projects([s.form_assignment for s in surveys])
+
+		entries = []
+		for survey in surveys:
+			entries.extend(get_pgs_entries(
+				survey.name,
+				items_by_survey.get(survey.name, []),
+				projects.get(survey.form_assignment)
+			))
+
+		features = make_features(entries)
+		write_features('PGS Survey', features, invalidate_tiles=False)
+		count += len(features)
+		last_name = surveys[-1].name
+
+	return count
+
+
+def get_assignment_projects(assignment_names):
+	"""Map Form Assignment names to their projects in one query."""
+	assignment_names = [a for a in set(assignment_names) if a]
+	if not assignment_names:
+		return {}
+
+	return dict(frappe.get_all(
+		'Form Assignment',
+		filters={'name': ['in', assignment_names]},
+		fields=['name', 'project'],
+		as_list=True
+	))
+
+
+def index_pgs_survey(doc):
+	"""Store the parsed geometries of a submitted PGS Survey."""
+	projects = get_assignment_projects([doc.form_assignment])
+	features = make_features(get_pgs_entries(doc.name, doc.items, projects.get(doc.form_assignment)))
+	write_features('PGS Survey', features, replace_names=[doc.name])
+
+
+def remove_pgs_survey_index(doc):
+	"""Drop the geometries of a cancelled or deleted PGS Survey."""
+	delete_features('PGS Survey', [doc.name])
+
+
+@frappe.whitelist()
+def enqueue_rebuild_index(doctype_name):
+	"""Rebuild the spatial index of a DocType in the background"""
+	frappe.only_for('System Manager')
+
+	if not get_geometry_field(doctype_name):
+		frappe.throw(f"DocType '{doctype_name}' has no geometry field to index")
+
+	if not is_served(doctype_name):
+		frappe.throw(f"DocType '{doctype_name}' is not used in any Form Assignment")
+
+	queue_rebuild(doctype_name)
+
+
+def queue_rebuild(doctype_name):
+	frappe.enqueue(
+		rebuild_index,
+		queue='long',
+		job_id=f'geo_feature_rebuild::{doctype_name}',
+		deduplicate=True,
+		doctype=doctype_name
+	)
+
+
+def _index_disabled():
+	return frappe.flags.in_install or frappe.flags.in_migrate or frappe.flags.in_patch
+
+
+def update_document_index(doc, method=None):
+	"""doc_events hook: re-index a document after it is saved"""
+	if _index_disabled() or not is_served(doc.doctype):
+		return
+
+	if doc.docstatus == 2:
+		delete_features(doc.doctype, [doc.name])
+		return
+
+	# A DocType without index rows yet is indexed as a whole, not one document at a time
+	if not has_index(doc.doctype):
+		queue_rebuild(doc.doctype)
+		return
+
+	geometry_field = get_geometry_field(doc.doctype)
+	write_features(doc.doctype, build_features([doc], geometry_field), replace_names=[doc.name])
+
+
+def remove_document_index(doc, method=None):
+	"""doc_events hook: drop the index rows of a cancelled or deleted document"""
+	if _index_disabled() or not is_served(doc.doctype):
+		return
+
+	delete_features(doc.doctype, [doc.name])
+
+
+def rename_document_index(doc, method=None, old=None, new=None, merge=False):
+	"""doc_events hook: follow a document rename"""
+	if _index_disabled() or not is_served(doc.doctype):
+		return
+
+	if merge:
+		delete_features(doc.doctype, [old])
+		return
+
+	tile_cache.invalidate_bboxes(doc.doctype, get_feature_bboxes(doc.doctype, [old]))
+	frappe.db.set_value(
+		'Geo Feature',
+		{'reference_doctype': doc.doctype, 'reference_name': old},
+		'reference_name',
+		new,
+		update_modified=False
+	)
@@ -0,0 +1,35 @@
+# Copyright (c) 2026, mohamed elsawy and Contributors
+# See license.txt
+
+from frappe.tests import UnitTestCase
+
+from farm_connector import encoding
+
+
+class TestEncoding(UnitTestCase):
+	"""
+	Unit tests for the compact MessagePack form of API responses.
+	Can be run with: bench --site [sitename] run-tests --module farm_connector.farm_connector.doctype.geo_feature.test_encoding
+	"""
+
+	def test_records_with_different_keys_are_compacted(self):
+		fields = [
+			{"fieldname": "section", "fieldtype": "Section Break"},
+			{"fieldname": "area", "fieldtype": "Float", "reqd": 1},
+		]
+
+		compacted = encoding.compact(fields)
+
+		self.assertEqual(compacted["__columns__"], ["fieldname", "fieldtype", "reqd"])
+		self.assertEqual(compacted["__rows__"], [["section", "Section Break", None], ["area", "Float", 1]])
+
+	def test_geometry_coordinates_are_delta_encoded(self):
+		polygon = {"type": "Polygon", "coordinates": [[[31.2, 30.1], [31.2001, 30.1], [31.2001, 30.1002], [31.2, 30.1]]]}
+
+		quantized = encoding.compact(polygon)
+
+		self.assertEqual(quantized["precision"], encoding.COORDINATE_PRECISION)
+		self.assertEqual(
+			quantized["coordinates"],
+			[[[31200000, 30100000], [100, 0], [0, 200], [-100, -200]]]
+		)
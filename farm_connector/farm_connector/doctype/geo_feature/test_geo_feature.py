@@ -0,0 +1,31 @@
+# Copyright (c) 2026, mohamed elsawy and Contributors
+# See license.txt
+
+import math
+
+from frappe.tests import UnitTestCase
+
+from farm_connector import geo
+
+
+class TestGeoFeature(UnitTestCase):
+	"""
+	Unit tests for the Geo Feature geometry helpers.
+	Can be run with: bench --site [sitename] run-tests --doctype "Geo Feature"
+	"""
+
+	def test_small_polygon_is_simplified_at_low_zoom(self):
+		# A plot about 20 m across with 32 vertices, smaller than one pixel at zoom 12
+		ring = [
+			[31.2 + 0.0001 * math.cos(2 * math.pi * i / 32), 30.1 + 0.0001 * math.sin(2 * math.pi * i / 32)]
+			for i in range(32)
+		]
+		ring.append(ring[0])
+		polygon = {"type": "Polygon", "coordinates": [ring]}
+
+		simplified = geo.simplify_geometry(polygon, geo.pixel_degrees(12))
+		simplified_ring = simplified["coordinates"][0]
+
+		self.assertLess(len(simplified_ring), len(ring))
+		self.assertEqual(len(simplified_ring), 4)
+		self.assertEqual(simplified_ring[0], simplified_ring[-1])
@@ -7,6 +7,13 @@ import frappe
 from frappe.model.document import Document
 from frappe.utils import flt, cint
 
+from farm_connector import conditional, encoding
+from farm_connector.farm_connector.doctype.geo_feature.geo_feature import (
+	index_pgs_survey,
+	remove_pgs_survey_index,
+)
+from farm_connector.template_schema import get_template_schema, slugify, to_expression_value
+
 class PGSSurvey(Document):
 	# begin: auto-generated types
 	# This code is auto-generated. Do not modify anything in this block.
@@ -30,31 +37,41 @@ class PGSSurvey(Document):
 		self.validate_field_types()
 		self.calculate_formulas()
 
+	def on_submit(self):
+		index_pgs_survey(self)
+
+	def on_cancel(self):
+		remove_pgs_survey_index(self)
+
+	def on_trash(self):
+		remove_pgs_survey_index(self)
+
 	def validate_template_submitted(self):
 		if self.template:
-			docstatus = frappe.db.get_value("PGS Template", self.template, "docstatus")
-			if docstatus != 1:
+			# The compiled schema only exists for submitted templates
+			try:
+				get_template_schema(self.template)
+			except frappe.ValidationError:
+				# Show only this message, not also the one thrown while loading the schema
+				frappe.clear_last_message()
 				frappe.throw(f"Template '{self.template}' must be submitted before it can be used in a survey.")
 
-	NUMERIC_FIELD_TYPES = ["Int", "Float", "Currency", "Percent", "Rating"]
-
-	def validate_mandatory(self):
-		# Build context for evaluating expressions
+	def get_expression_context(self):
+		"""Field values by label and by variable name, for evaluating expressions"""
 		context = {}
 		for i in self.items:
-			var_name = i.field_label.lower().replace(" ", "_").replace("-", "_")
-			val = i.reading_value
-			try:
-				if i.field_type in self.NUMERIC_FIELD_TYPES or (val and str(val).replace('.','',1).replace('-','',1).isdigit()):
-					val = flt(val)
-			except:
-				pass
-			context[var_name] = val
+			val = to_expression_value(i.reading_value, i.field_type)
+			context[slugify(i.field_label)] = val
 			context[i.field_label] = val
+		return context
+
+	def validate_mandatory(self):
+		# Build context for evaluating expressions
+		context = self.get_expression_context()
 
 		for item in self.items:
 			# Skip if item is not visible
-			if not self.is_item_visible(item):
+			if not self.is_item_visible(item, context):
 				continue
 
 			# Check if field is mandatory
@@ -144,24 +161,13 @@ class PGSSurvey(Document):
 					if not frappe.db.exists(item.link_doctype, val):
 						frappe.throw(f"Row {item.idx}: {item.field_label} - '{val}' does not exist in {item.link_doctype}")
 
-	def is_item_visible(self, item):
+	def is_item_visible(self, item, context=None):
 		if not item.display_depends_on:
 			return True
 
 		# Build context with all field values
-		context = {}
-		for i in self.items:
-			var_name = i.field_label.lower().replace(" ", "_").replace("-", "_")
-			val = i.reading_value
-
-			try:
-				if i.field_type in self.NUMERIC_FIELD_TYPES or (val and str(val).replace('.','',1).replace('-','',1).isdigit()):
-					val = flt(val)
-			except:
-				pass
-
-			context[var_name] = val
-			context[i.field_label] = val
+		if context is None:
+			context = self.get_expression_context()
 
 		try:
 			result = frappe.safe_eval(item.display_depends_on, None, context)
@@ -172,18 +178,7 @@ class PGSSurvey(Document):
 
 	def calculate_formulas(self):
 		# Map values to labels for formula context
-		values = {}
-		for item in self.items:
-			val = item.reading_value
-			try:
-				if item.field_type in self.NUMERIC_FIELD_TYPES or (val and val.replace('.','',1).isdigit()):
-					val = flt(val)
-			except:
-				pass
-
-			values[item.field_label] = val
-			key = item.field_label.lower().replace(" ", "_")
-			values[key] = val
+		values = self.get_expression_context()
 
 		# Apply formulas
 		for item in self.items:
@@ -194,33 +189,24 @@ class PGSSurvey(Document):
 
 					# Update context for subsequent formulas
 					values[item.field_label] = result
-					key = item.field_label.lower().replace(" ", "_")
-					values[key] = result
+					values[slugify(item.field_label)] = result
 				except Exception as e:
 					frappe.log_error(f"Formula Error in {item.field_label}: {e}")
 
 @frappe.whitelist()
-def get_template_details(template_name):
-	template = frappe.get_doc("PGS Template", template_name)
-	if template.docstatus != 1:
+@encoding.negotiated
+def get_template_details(template_name, etag=None):
+	try:
+		schema = get_template_schema(template_name)
+	except frappe.DoesNotExistError:
+		raise
+	except frappe.ValidationError:
 		frappe.throw(f"PGS Template '{template_name}' is not submitted. Only submitted templates can be used.")
-	return {
-		"items": [
-			{
-				"section": item.section,
-				"field_label": item.field_label,
-				"fieldname": item.fieldname,
-				"field_type": item.field_type,
-				"is_mandatory": item.is_mandatory,
-				"options": item.options,
-				"link_doctype": item.link_doctype,
-				"formula": item.formula,
-				"allow_multiple": item.allow_multiple,
-				"help_text": item.help_text,
-				"display_depends_on": item.display_depends_on,
-				"mandatory_depends_on": item.mandatory_depends_on
-			}
-			for item in template.items
-		],
-		"section_order": template.section_order
-	}
+
+	# The content hash identifies the definitions, so clients can keep them indefinitely
+	current_etag = conditional.make_etag("template", template_name, schema.content_hash)
+	not_modified = conditional.get_not_modified_response(current_etag, etag)
+	if not_modified:
+		return not_modified
+
+	return {"etag": current_etag, **schema.details}
@@ -1,8 +1,12 @@
 # Copyright (c) 2026, mohamed elsawy and contributors
 # For license information, please see license.txt
 
+import frappe
 from frappe.model.document import Document
 
+from farm_connector import cache, template_cache
+from farm_connector.template_schema import get_content_hash
+
 class PGSTemplate(Document):
 	# begin: auto-generated types
 	# This code is auto-generated. Do not modify anything in this block.
@@ -14,10 +18,29 @@ class PGSTemplate(Document):
 		from farm_connector.farm_connector.doctype.pgs_template_section.pgs_template_section import PGSTemplateSection
 
 		category: DF.Literal["", "Pre-Germination", "Post-Harvest", "Soil Analysis", "Crop Health", "General"]
+		content_hash: DF.Data | None
 		description: DF.SmallText | None
 		is_active: DF.Check
 		items: DF.Table[PGSTemplateSection]
 		section_order: DF.Text | None
 		template_name: DF.Data
 	# end: auto-generated types
-	pass
+
+	def before_submit(self):
+		self.content_hash = get_content_hash([item.as_dict() for item in self.items], self.section_order)
+
+	def on_cancel(self):
+		template_cache.clear(self.name)
+		self.clear_assigned_forms()
+
+	def on_trash(self):
+		template_cache.clear(self.name)
+		self.clear_assigned_forms()
+
+	def clear_assigned_forms(self):
+		"""Forget the cached assignment lists and offline bundles that carry this template's hash"""
+		users = frappe.get_all(
+			'Form Assignment', filters={'pgs_template': self.name}, distinct=True, pluck='user'
+		)
+		cache.clear_assigned_forms(*users)
+		cache.clear_offline_bundles(*users)
@@ -0,0 +1,401 @@
+"""
+Geometry helpers shared by the Farm Connector spatial endpoints
+"""
+
+import json
+import math
+
+import numpy as np
+
+# Mean Earth radius in kilometres
+EARTH_RADIUS_KM = 6371.0088
+
+# Mean kilometres per degree of latitude
+KM_PER_DEGREE = 111.32
+
+# Size of one spatial index grid cell in degrees (~5.5 km at the equator)
+GRID_CELL_DEGREES = 0.05
+
+# Above this many cells a grid lookup is no cheaper than a range scan
+MAX_GRID_CELLS = 400
+
+# Latitude limit of the Web Mercator tile grid
+MAX_MERCATOR_LAT = 85.0511287798
+
+# Level-of-detail bands: (highest map zoom served, Geo Feature field holding the simplified geometry).
+# Each band is simplified to one 256px tile pixel at its highest zoom; above the last band
+# the full resolution geometry is served.
+LOD_BANDS = (
+	(12, 'geometry_low'),
+	(15, 'geometry_medium'),
+)
+
+
+def parse_geometry(value):
+	"""
+	Return the GeoJSON geometry stored in a field value.
+	Accepts a JSON string or dict holding a FeatureCollection, Feature or bare geometry.
+	"""
+	if not value:
+		return None
+
+	try:
+		geojson_obj = json.loads(value) if isinstance(value, str) else value
+	except (json.JSONDecodeError, TypeError):
+		return None
+
+	if not isinstance(geojson_obj, dict):
+		return None
+
+	try:
+		if geojson_obj.get('type') == 'FeatureCollection':
+			if not geojson_obj.get('features'):
+				return None
+			geometry = geojson_obj['features'][0].get('geometry')
+		elif geojson_obj.get('type') == 'Feature':
+			geometry = geojson_obj.get('geometry')
+		else:
+			geometry = geojson_obj
+	except (IndexError, AttributeError):
+		return None
+
+	return geometry if isinstance(geometry, dict) else None
+
+
+def compute_metrics(geometries):
+	"""
+	Compute the center, bounding box and area of many GeoJSON geometries in one vectorized pass.
+	All vertices are packed into a single NumPy array; per-ring and per-geometry sums use reduceat/bincount.
+	Polygon centers are area-weighted centroids (holes subtracted), other geometries use the vertex mean.
+
+	Returns:
+		list: One dict per geometry with center_lat, center_lng, min_lat, min_lng, max_lat, max_lng
+			and area_hectares, or None for geometries without usable coordinates
+	"""
+	results = [None] * len(geometries)
+
+	rings = []
+	ring_geometry = []
+	ring_sign = []
+	for index, geometry in enumerate(geometries):
+		for ring, sign in _iter_rings(geometry):
+			try:
+				ring_array = np.asarray(ring, dtype=float)
+			except (TypeError, ValueError):
+				continue
+			if ring_array.ndim != 2 or not len(ring_array) or ring_array.shape[1] < 2:
+				continue
+			rings.append(ring_array[:, :2])
+			ring_geometry.append(index)
+			ring_sign.append(sign)
+
+	if not rings:
+		return results
+
+	coords = np.concatenate(rings)
+	lng = coords[:, 0]
+	lat = coords[:, 1]
+
+	ring_length = np.fromiter((len(r) for r in rings), dtype=np.int64, count=len(rings))
+	ring_start = np.concatenate(([0], np.cumsum(ring_length)[:-1]))
+	ring_geometry = np.asarray(ring_geometry)
+	ring_sign = np.asarray(ring_sign, dtype=float)
+
+	# Vertices are grouped by geometry, so reduceat over geometry starts gives per-geometry values
+	vertex_geometry = np.repeat(ring_geometry, ring_length)
+	geometry_ids, geometry_start, vertex_count = np.unique(vertex_geometry, return_index=True, return_counts=True)
+
+	min_lng = np.minimum.reduceat(lng, geometry_start)
+	max_lng = np.maximum.reduceat(lng, geometry_start)
+	min_lat = np.minimum.reduceat(lat, geometry_start)
+	max_lat = np.maximum.reduceat(lat, geometry_start)
+	mean_lng = np.add.reduceat(lng, geometry_start) / vertex_count
+	mean_lat = np.add.reduceat(lat, geometry_start) / vertex_count
+
+	# Project onto a local plane in metres around each geometry's vertex mean
+	origin_lng = np.repeat(mean_lng, vertex_count)
+	origin_lat = np.repeat(mean_lat, vertex_count)
+	metres_per_degree = KM_PER_DEGREE * 1000
+	lng_scale = np.cos(np.radians(mean_lat)) * metres_per_degree
+	x = (lng - origin_lng) * np.repeat(lng_scale, vertex_count)
+	y = (lat - origin_lat) * metres_per_degree
+
+	# Shoelace terms, wrapping each ring's last vertex to its own first vertex
+	next_vertex = np.arange(len(coords)) + 1
+	next_vertex[ring_start + ring_length - 1] = ring_start
+	cross = x * y[next_vertex] - x[next_vertex] * y
+
+	ring_cross = np.add.reduceat(cross, ring_start)
+	ring_area = np.abs(ring_cross) / 2
+	safe_cross = np.where(ring_cross == 0, 1, ring_cross)
+	ring_cx = np.add.reduceat((x + x[next_vertex]) * cross, ring_start) / (3 * safe_cross)
+	ring_cy = np.add.reduceat((y + y[next_vertex]) * cross, ring_start) / (3 * safe_cross)
+
+	weight = ring_sign * ring_area
+	size = len(geometries)
+	area = np.bincount(ring_geometry, weights=weight, minlength=size)[geometry_ids]
+	centroid_x = np.bincount(ring_geometry, weights=weight * ring_cx, minlength=size)[geometry_ids]
+	centroid_y = np.bincount(ring_geometry, weights=weight * ring_cy, minlength=size)[geometry_ids]
+
+	has_area = area > 0
+	safe_area = np.where(has_area, area, 1)
+	center_lng = np.where(has_area, mean_lng + centroid_x / safe_area / np.where(lng_scale == 0, 1, lng_scale), mean_lng)
+	center_lat = np.where(has_area, mean_lat + centroid_y / safe_area / metres_per_degree, mean_lat)
+	area_hectares = np.where(has_area, area / 10000, 0)
+
+	for i, index in enumerate(geometry_ids.tolist()):
+		results[index] = {
+			'center_lat': float(center_lat[i]),
+			'center_lng': float(center_lng[i]),
+			'min_lat': float(min_lat[i]),
+			'min_lng': float(min_lng[i]),
+			'max_lat': float(max_lat[i]),
+			'max_lng': float(max_lng[i]),
+			'area_hectares': float(area_hectares[i]),
+		}
+
+	return results
+
+
+def _iter_rings(geometry):
+	"""Yield (coordinate sequence, area sign) pairs: +1 for outer rings, -1 for holes, 0 for points and lines."""
+	if not isinstance(geometry, dict):
+		return
+
+	geo_type = geometry.get('type')
+	if geo_type == 'GeometryCollection':
+		for member in geometry.get('geometries') or []:
+			yield from _iter_rings(member)
+		return
+
+	coords = geometry.get('coordinates')
+	if not coords:
+		return
+
+	if geo_type == 'Point':
+		yield [coords], 0
+	elif geo_type in ('MultiPoint', 'LineString'):
+		yield coords, 0
+	elif geo_type == 'MultiLineString':
+		for line in coords:
+			yield line, 0
+	elif geo_type == 'Polygon':
+		for i, ring in enumerate(coords):
+			yield ring, 1 if i == 0 else -1
+	elif geo_type == 'MultiPolygon':
+		for polygon in coords:
+			for i, ring in enumerate(polygon):
+				yield ring, 1 if i == 0 else -1
+
+
+def pixel_degrees(zoom):
+	"""Return the width of one 256px map tile pixel in degrees at a zoom level."""
+	return 360.0 / (256 * 2 ** int(zoom))
+
+
+def lnglat_to_tile_fraction(lng, lat, zoom):
+	"""Return the fractional Web Mercator tile (x, y) of a point at a zoom level."""
+	lat = max(min(float(lat), MAX_MERCATOR_LAT), -MAX_MERCATOR_LAT)
+	n = 2 ** int(zoom)
+	x = (float(lng) + 180.0) / 360.0 * n
+	y = (1.0 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2.0 * n
+	return x, y
+
+
+def tile_bounds(zoom, x, y):
+	"""Return the (min_lat, min_lng, max_lat, max_lng) covered by tile z/x/y."""
+	n = 2 ** int(zoom)
+	min_lng = x / n * 360.0 - 180.0
+	max_lng = (x + 1) / n * 360.0 - 180.0
+	max_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * y / n))))
+	min_lat = math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * (y + 1) / n))))
+	return min_lat, min_lng, max_lat, max_lng
+
+
+def tiles_for_bbox(min_lat, min_lng, max_lat, max_lng, zoom, max_tiles=None):
+	"""
+	Return the (z, x, y) tiles covering a bounding box at a zoom level,
+	or None when there would be more than max_tiles of them.
+	"""
+	n = 2 ** int(zoom)
+	x_start, y_start = lnglat_to_tile_fraction(min_lng, max_lat, zoom)
+	x_end, y_end = lnglat_to_tile_fraction(max_lng, min_lat, zoom)
+	x_range = range(max(int(x_start), 0), min(int(x_end), n - 1) + 1)
+	y_range = range(max(int(y_start), 0), min(int(y_end), n - 1) + 1)
+
+	if max_tiles is not None and len(x_range) * len(y_range) > max_tiles:
+		return None
+
+	return [(int(zoom), tx, ty) for tx in x_range for ty in y_range]
+
+
+def tile_manifest(points, buffer_km, min_zoom, max_zoom, max_tiles=None):
+	"""
+	Return the sorted, deduplicated [z, x, y] tiles covering a buffer around every point
+	for each zoom from min_zoom to max_zoom, and the highest zoom covered.
+	If more than max_tiles would be needed, the zooms that do not fit completely are left out
+	and the highest zoom covered is below max_zoom (min_zoom - 1 if none fits).
+	"""
+	tiles = set()
+	for zoom in range(int(min_zoom), int(max_zoom) + 1):
+		zoom_tiles = set()
+		for lat, lng in points:
+			remaining = None if max_tiles is None else max_tiles - len(tiles) - len(zoom_tiles)
+			point_tiles = tiles_for_bbox(*bounding_box(lat, lng, buffer_km), zoom, max_tiles=remaining)
+			if point_tiles is None:
+				return [list(tile) for tile in sorted(tiles)], zoom - 1
+			zoom_tiles.update(point_tiles)
+		tiles.update(zoom_tiles)
+
+	return [list(tile) for tile in sorted(tiles)], int(max_zoom)
+
+
+def get_lod_field(zoom):
+	"""Return the Geo Feature geometry field to serve at a map zoom level."""
+	for max_zoom, fieldname in LOD_BANDS:
+		if int(zoom) <= max_zoom:
+			return fieldname
+	return 'geometry'
+
+
+def simplify_geometry(geometry, tolerance):
+	"""
+	Return a copy of a GeoJSON geometry simplified with Douglas-Peucker.
+	Tolerance is in degrees; polygon rings keep at least four points and stay closed,
+	collapsing to a minimal triangle when the tolerance exceeds their size.
+	"""
+	if not isinstance(geometry, dict):
+		return geometry
+
+	geo_type = geometry.get('type')
+	coords = geometry.get('coordinates')
+
+	if geo_type == 'GeometryCollection':
+		return {
+			'type': geo_type,
+			'geometries': [simplify_geometry(g, tolerance) for g in geometry.get('geometries') or []]
+		}
+
+	if not coords or geo_type in ('Point', 'MultiPoint'):
+		return geometry
+
+	try:
+		if geo_type == 'LineString':
+			coords = _simplify_line(coords, tolerance, 2)
+		elif geo_type == 'MultiLineString':
+			coords = [_simplify_line(line, tolerance, 2) for line in coords]
+		elif geo_type == 'Polygon':
+			coords = [_simplify_line(ring, tolerance, 4) for ring in coords]
+		elif geo_type == 'MultiPolygon':
+			coords = [[_simplify_line(ring, tolerance, 4) for ring in polygon] for polygon in coords]
+		else:
+			return geometry
+	except (TypeError, ValueError):
+		return geometry
+
+	return {'type': geo_type, 'coordinates': coords}
+
+
+def _simplify_line(line, tolerance, min_points):
+	"""Douglas-Peucker over one coordinate sequence; rings that would fall below min_points become a minimal ring."""
+	points = np.asarray(line, dtype=float)
+	if points.ndim != 2 or len(points) <= min_points:
+		return line
+
+	points = points[:, :2]
+	keep = np.zeros(len(points), dtype=bool)
+	keep[0] = keep[-1] = True
+
+	stack = [(0, len(points) - 1)]
+	while stack:
+		start, end = stack.pop()
+		if end - start < 2:
+			continue
+
+		a = points[start]
+		direction = points[end] - a
+		inner = points[start + 1:end] - a
+		length = math.hypot(direction[0], direction[1])
+		if length:
+			distance = np.abs(direction[0] * inner[:, 1] - direction[1] * inner[:, 0]) / length
+		else:
+			# Closed ring: measure from the shared start/end vertex
+			distance = np.hypot(inner[:, 0], inner[:, 1])
+
+		farthest = int(np.argmax(distance))
+		if distance[farthest] > tolerance:
+			split = start + 1 + farthest
+			keep[split] = True
+			stack.append((start, split))
+			stack.append((split, end))
+
+	if keep.sum() < min_points:
+		return _minimal_ring(points)
+
+	return points[keep].tolist()
+
+
+def _minimal_ring(points):
+	"""
+	Return the smallest closed ring of a sequence: its first vertex, the vertex farthest from it,
+	the vertex farthest from the line between those two, and the first vertex again.
+	"""
+	first = points[0]
+	offset = points - first
+	farthest = int(np.argmax(np.hypot(offset[:, 0], offset[:, 1])))
+	direction = offset[farthest]
+	third = int(np.argmax(np.abs(direction[0] * offset[:, 1] - direction[1] * offset[:, 0])))
+
+	# Keep the vertices in their original order so the ring keeps its winding
+	second, third = sorted((farthest, third))
+	return points[[0, second, third, 0]].tolist()
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+	"""Return the great-circle distance in km between two points."""
+	lat1, lng1, lat2, lng2 = map(math.radians, (float(lat1), float(lng1), float(lat2), float(lng2)))
+	a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+	return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def bounding_box(lat, lng, radius_km):
+	"""
+	Return the (min_lat, min_lng, max_lat, max_lng) box enclosing a circle.
+	The longitude span widens towards the poles and is clamped there instead of dividing by zero.
+	"""
+	lat = float(lat)
+	lng = float(lng)
+	lat_delta = float(radius_km) / KM_PER_DEGREE
+
+	cos_lat = math.cos(math.radians(lat))
+	if cos_lat < 0.01:
+		lng_delta = 180.0
+	else:
+		lng_delta = min(float(radius_km) / (KM_PER_DEGREE * cos_lat), 180.0)
+
+	return lat - lat_delta, lng - lng_delta, lat + lat_delta, lng + lng_delta
+
+
+def grid_cell(lat, lng):
+	"""Return the spatial index cell key for a point."""
+	return f'{math.floor(float(lat) / GRID_CELL_DEGREES)}:{math.floor(float(lng) / GRID_CELL_DEGREES)}'
+
+
+def grid_cells_for_bbox(min_lat, min_lng, max_lat, max_lng):
+	"""
+	Return the cell keys covering a bounding box,
+	or None when the box spans too many cells for a keyed lookup.
+	"""
+	lat_start = math.floor(min_lat / GRID_CELL_DEGREES)
+	lat_end = math.floor(max_lat / GRID_CELL_DEGREES)
+	lng_start = math.floor(min_lng / GRID_CELL_DEGREES)
+	lng_end = math.floor(max_lng / GRID_CELL_DEGREES)
+
+	if (lat_end - lat_start + 1) * (lng_end - lng_start + 1) > MAX_GRID_CELLS:
+		return None
+
+	return [
+		f'{i}:{j}'
+		for i in range(lat_start, lat_end + 1)
+		for j in range(lng_start, lng_end + 1)
+	]
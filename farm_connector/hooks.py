@@ -88,6 +88,11 @@ app_include_js = [
 # before_install = "farm_connector.install.before_install"
 # after_install = "farm_connector.install.after_install"
 
+# Migration
+# ------------
+
+after_migrate = ["farm_connector.cache.clear_all_doctype_fields"]
+
 # Uninstallation
 # ------------
 
@@ -140,34 +145,42 @@ app_include_js = [
 # ---------------
 # Hook on document methods and events
 
-# doc_events = {
-# 	"*": {
-# 		"on_update": "method",
-# 		"on_cancel": "method",
-# 		"on_trash": "method"
-# 	}
-# }
+# The "*" geo_feature handlers return at once unless the DocType is used in a Form Assignment
+doc_events = {
+	"*": {
+		"on_update": "farm_connector.farm_connector.doctype.geo_feature.geo_feature.update_document_index",
+		"on_cancel": "farm_connector.farm_connector.doctype.geo_feature.geo_feature.remove_document_index",
+		"on_trash": "farm_connector.farm_connector.doctype.geo_feature.geo_feature.remove_document_index",
+		"after_rename": "farm_connector.farm_connector.doctype.geo_feature.geo_feature.rename_document_index"
+	},
+	"Project": {
+		"on_update": "farm_connector.cache.clear_project_location",
+		"on_trash": "farm_connector.cache.clear_project_location",
+		"after_rename": "farm_connector.cache.clear_project_location"
+	},
+	"DocType": {
+		"on_update": "farm_connector.cache.clear_doctype_fields",
+		"on_trash": "farm_connector.cache.clear_doctype_fields",
+		"after_rename": "farm_connector.cache.clear_doctype_fields"
+	},
+	"Custom Field": {
+		"on_update": "farm_connector.cache.clear_doctype_fields",
+		"on_trash": "farm_connector.cache.clear_doctype_fields"
+	},
+	"Property Setter": {
+		"on_update": "farm_connector.cache.clear_doctype_fields",
+		"on_trash": "farm_connector.cache.clear_doctype_fields"
+	}
+}
 
 # Scheduled Tasks
 # ---------------
 
-# scheduler_events = {
-# 	"all": [
-# 		"farm_connector.tasks.all"
-# 	],
-# 	"daily": [
-# 		"farm_connector.tasks.daily"
-# 	],
-# 	"hourly": [
-# 		"farm_connector.tasks.hourly"
-# 	],
-# 	"weekly": [
-# 		"farm_connector.tasks.weekly"
-# 	],
-# 	"monthly": [
-# 		"farm_connector.tasks.monthly"
-# 	],
-# }
+scheduler_events = {
+	"daily": [
+		"farm_connector.farm_connector.doctype.form_assignment_tombstone.form_assignment_tombstone.clear_old_tombstones"
+	],
+}
 
 # Testing
 # -------
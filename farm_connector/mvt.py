@@ -0,0 +1,224 @@
+"""
+Minimal Mapbox Vector Tile (v2.1) encoder for farm polygons
+Writes the protobuf wire format directly, so no protobuf dependency is needed.
+"""
+
+import struct
+
+from farm_connector import geo
+
+# Tile coordinate space of one tile
+EXTENT = 4096
+
+# MVT geometry types
+GEOM_POINT = 1
+GEOM_LINESTRING = 2
+GEOM_POLYGON = 3
+
+# MVT geometry commands
+CMD_MOVE_TO = 1
+CMD_LINE_TO = 2
+CMD_CLOSE_PATH = 7
+
+# Protobuf wire types
+WIRE_VARINT = 0
+WIRE_64BIT = 1
+WIRE_LENGTH = 2
+
+
+def encode_tile(layers, z, x, y):
+	"""
+	Encode layers of GeoJSON features into a vector tile.
+
+	Args:
+		layers (dict): {layer name: [(geometry, properties), ...]}
+		z, x, y (int): Tile address
+
+	Returns:
+		bytes: Encoded tile; layers without drawable features are omitted
+	"""
+	tile = bytearray()
+	for name, features in layers.items():
+		layer = _encode_layer(name, features, z, x, y)
+		if layer:
+			tile += _field(3, WIRE_LENGTH, layer)
+	return bytes(tile)
+
+
+def _encode_layer(name, features, z, x, y):
+	keys = {}
+	values = {}
+	encoded_features = bytearray()
+
+	for geometry, properties in features:
+		geom_type, commands = _encode_geometry(geometry, z, x, y)
+		if not commands:
+			continue
+
+		tags = []
+		for key, value in (properties or {}).items():
+			if value is None:
+				continue
+			value_key = (type(value).__name__, value)
+			tags.append(keys.setdefault(key, len(keys)))
+			tags.append(values.setdefault(value_key, len(values)))
+
+		feature = bytearray()
+		if tags:
+			feature += _field(2, WIRE_LENGTH, _packed(tags))
+		feature += _field(3, WIRE_VARINT, geom_type)
+		feature += _field(4, WIRE_LENGTH, _packed(commands))
+		encoded_features += _field(2, WIRE_LENGTH, feature)
+
+	if not encoded_features:
+		return None
+
+	layer = bytearray()
+	layer += _field(15, WIRE_VARINT, 2)
+	layer += _field(1, WIRE_LENGTH, name.encode())
+	layer += encoded_features
+	for key in keys:
+		layer += _field(3, WIRE_LENGTH, str(key).encode())
+	for _type_name, value in values:
+		layer += _field(4, WIRE_LENGTH, _encode_value(value))
+	layer += _field(5, WIRE_VARINT, EXTENT)
+	return layer
+
+
+def _encode_value(value):
+	if isinstance(value, bool):
+		return _field(7, WIRE_VARINT, int(value))
+	if isinstance(value, int):
+		return _field(6, WIRE_VARINT, _zigzag(value))
+	if isinstance(value, float):
+		return _field(3, WIRE_64BIT, struct.pack('<d', value))
+	return _field(1, WIRE_LENGTH, str(value).encode())
+
+
+def _encode_geometry(geometry, z, x, y):
+	"""Return (MVT geometry type, command integers) for a GeoJSON geometry in tile space."""
+	if not isinstance(geometry, dict) or not geometry.get('coordinates'):
+		return None, None
+
+	geo_type = geometry['type']
+	coords = geometry['coordinates']
+	cursor = [0, 0]
+
+	try:
+		if geo_type in ('Point', 'MultiPoint'):
+			points = [coords] if geo_type == 'Point' else coords
+			return GEOM_POINT, _point_commands([_project(p, z, x, y) for p in points], cursor)
+
+		if geo_type in ('LineString', 'MultiLineString'):
+			lines = [coords] if geo_type == 'LineString' else coords
+			commands = []
+			for line in lines:
+				commands += _line_commands(_dedupe([_project(p, z, x, y) for p in line]), cursor)
+			return GEOM_LINESTRING, commands
+
+		if geo_type in ('Polygon', 'MultiPolygon'):
+			polygons = [coords] if geo_type == 'Polygon' else coords
+			commands = []
+			for polygon in polygons:
+				for index, ring in enumerate(polygon):
+					commands += _ring_commands(ring, index == 0, z, x, y, cursor)
+			return GEOM_POLYGON, commands
+	except (TypeError, ValueError, IndexError):
+		pass
+
+	return None, None
+
+
+def _point_commands(points, cursor):
+	commands = [_command(CMD_MOVE_TO, len(points))]
+	for point in points:
+		commands += _delta(point, cursor)
+	return commands
+
+
+def _line_commands(points, cursor):
+	if len(points) < 2:
+		return []
+	commands = [_command(CMD_MOVE_TO, 1), *_delta(points[0], cursor), _command(CMD_LINE_TO, len(points) - 1)]
+	for point in points[1:]:
+		commands += _delta(point, cursor)
+	return commands
+
+
+def _ring_commands(ring, is_exterior, z, x, y, cursor):
+	points = _dedupe([_project(p, z, x, y) for p in ring])
+	if len(points) > 1 and points[0] == points[-1]:
+		points.pop()
+	if len(points) < 3:
+		return []
+
+	# Exterior rings must have positive area in tile space (y pointing down), holes negative
+	area = sum(a[0] * b[1] - b[0] * a[1] for a, b in zip(points, points[1:] + points[:1], strict=True))
+	if area == 0:
+		return []
+	if (area > 0) != is_exterior:
+		points.reverse()
+
+	commands = [_command(CMD_MOVE_TO, 1), *_delta(points[0], cursor), _command(CMD_LINE_TO, len(points) - 1)]
+	for point in points[1:]:
+		commands += _delta(point, cursor)
+	commands.append(_command(CMD_CLOSE_PATH, 1))
+	return commands
+
+
+def _project(point, z, x, y):
+	"""Project a [lng, lat] pair to integer coordinates inside tile z/x/y."""
+	tile_x, tile_y = geo.lnglat_to_tile_fraction(point[0], point[1], z)
+	return [round((tile_x - x) * EXTENT), round((tile_y - y) * EXTENT)]
+
+
+def _dedupe(points):
+	"""Drop consecutive points that quantize to the same tile coordinate."""
+	result = []
+	for point in points:
+		if not result or result[-1] != point:
+			result.append(point)
+	return result
+
+
+def _delta(point, cursor):
+	dx = point[0] - cursor[0]
+	dy = point[1] - cursor[1]
+	cursor[0], cursor[1] = point
+	return [_zigzag(dx), _zigzag(dy)]
+
+
+def _command(command_id, count):
+	return (command_id & 0x7) | (count << 3)
+
+
+def _zigzag(n):
+	return (n << 1) ^ (n >> 63)
+
+
+def _varint(n):
+	out = bytearray()
+	while True:
+		byte = n & 0x7F
+		n >>= 7
+		if n:
+			out.append(byte | 0x80)
+		else:
+			out.append(byte)
+			return out
+
+
+def _packed(numbers):
+	out = bytearray()
+	for n in numbers:
+		out += _varint(n)
+	return out
+
+
+def _field(number, wire_type, value):
+	key = _varint((number << 3) | wire_type)
+	if wire_type == WIRE_VARINT:
+		return key + _varint(value)
+	if wire_type == WIRE_64BIT:
+		return key + value
+	return key + _varint(len(value)) + value
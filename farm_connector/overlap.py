@@ -0,0 +1,114 @@
+"""
+Server-side polygon overlap detection
+Candidates come from the Geo Feature bounding box index, are narrowed
+with an in-memory STR-tree, and only then tested exactly on a local metric plane.
+"""
+
+import json
+import math
+
+import frappe
+import numpy as np
+import shapely
+from shapely.geometry import shape
+
+from farm_connector import geo
+
+# Polygon types that can overlap
+AREAL_TYPES = ('Polygon', 'MultiPolygon')
+
+
+def find_overlaps(geometry, doctype_name, exclude_name=None, project_id=None, min_overlap_m2=1.0):
+	"""
+	Return the indexed features of a DocType that overlap a polygon.
+
+	Args:
+		geometry (dict): GeoJSON Polygon or MultiPolygon
+		doctype_name (str): DocType whose features are tested
+		exclude_name (str): Optional document to skip, e.g. the farm being edited
+		project_id (str): Optional project filter
+		min_overlap_m2 (float): Overlaps smaller than this are ignored (shared edges, GPS noise)
+
+	Returns:
+		list: One dict per overlapping feature, largest overlap first
+	"""
+	metrics = geo.compute_metrics([geometry])[0]
+	if not metrics or not metrics['area_hectares']:
+		return []
+
+	origin = (metrics['center_lat'], metrics['center_lng'])
+	candidate = _to_local(shapely.make_valid(shape(geometry)), *origin)
+
+	rows = _get_candidate_rows(metrics, doctype_name, exclude_name, project_id)
+	if not rows:
+		return []
+
+	existing = []
+	for row in rows:
+		try:
+			existing.append(_to_local(shapely.make_valid(shape(json.loads(row.geometry))), *origin))
+		except (ValueError, TypeError, AttributeError, shapely.errors.ShapelyError):
+			existing.append(shapely.Polygon())
+
+	# Narrow to features whose envelope actually meets the polygon before exact intersection
+	tree = shapely.STRtree(existing)
+	hits = tree.query(candidate, predicate='intersects')
+
+	candidate_area = candidate.area
+	overlaps = []
+	for index in hits.tolist():
+		overlap_area = candidate.intersection(existing[index]).area
+		if overlap_area < float(min_overlap_m2):
+			continue
+
+		row = rows[index]
+		existing_area = existing[index].area
+		overlaps.append({
+			'name': row.reference_name,
+			'field_label': row.field_label,
+			'project': row.project,
+			'overlap_hectares': round(overlap_area / 10000, 4),
+			'overlap_percent': round(overlap_area / candidate_area * 100, 2) if candidate_area else None,
+			'existing_overlap_percent': round(overlap_area / existing_area * 100, 2) if existing_area else None
+		})
+
+	overlaps.sort(key=lambda o: o['overlap_hectares'], reverse=True)
+	return overlaps
+
+
+def _get_candidate_rows(metrics, doctype_name, exclude_name=None, project_id=None):
+	"""Fetch the polygons whose stored bounding box intersects the candidate's."""
+	filters = {
+		'reference_doctype': doctype_name,
+		'min_lat': ['<=', metrics['max_lat']],
+		'max_lat': ['>=', metrics['min_lat']],
+		'min_lng': ['<=', metrics['max_lng']],
+		'max_lng': ['>=', metrics['min_lng']],
+		'area_hectares': ['>', 0]
+	}
+
+	if exclude_name:
+		filters['reference_name'] = ['!=', exclude_name]
+
+	if project_id:
+		filters['project'] = project_id
+
+	return frappe.get_all(
+		'Geo Feature',
+		filters=filters,
+		fields=['reference_name', 'field_label', 'project', 'geometry']
+	)
+
+
+def _to_local(geometry, origin_lat, origin_lng):
+	"""Project a lng/lat geometry onto a plane in metres around an origin."""
+	metres_per_degree = geo.KM_PER_DEGREE * 1000
+	lng_scale = math.cos(math.radians(origin_lat)) * metres_per_degree
+
+	def project(coords):
+		return np.column_stack((
+			(coords[:, 0] - origin_lng) * lng_scale,
+			(coords[:, 1] - origin_lat) * metres_per_degree
+		))
+
+	return shapely.transform(geometry, project)
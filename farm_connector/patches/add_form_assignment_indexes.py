@@ -0,0 +1,6 @@
+from farm_connector.farm_connector.doctype.form_assignment.form_assignment import add_indexes
+
+
+def execute():
+	"""Add the composite indexes used by the assignment sync queries"""
+	add_indexes()
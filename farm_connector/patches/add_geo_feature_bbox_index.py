@@ -0,0 +1,6 @@
+from farm_connector.farm_connector.doctype.geo_feature.geo_feature import add_bbox_index
+
+
+def execute():
+	"""Add the bounding box index used by the tile and overlap queries"""
+	add_bbox_index()
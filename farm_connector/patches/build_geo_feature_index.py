@@ -0,0 +1,12 @@
+import frappe
+
+from farm_connector.farm_connector.doctype.geo_feature.geo_feature import rebuild_index
+
+
+def execute():
+	"""Index the geometries of every DocType that is used in a Form Assignment"""
+	doctypes = frappe.get_all('Form Assignment', distinct=True, pluck='doctype_name')
+
+	for doctype in doctypes:
+		if doctype and frappe.db.exists('DocType', doctype):
+			rebuild_index(doctype)
@@ -0,0 +1,6 @@
+from farm_connector.farm_connector.doctype.geo_feature.geo_feature import rebuild_pgs_index
+
+
+def execute():
+	"""Store the parsed geometries of already submitted PGS Surveys"""
+	rebuild_pgs_index()
@@ -0,0 +1,13 @@
+import frappe
+
+from farm_connector.template_schema import get_content_hash
+
+
+def execute():
+	"""Compute the content hash of templates submitted before it existed"""
+	templates = frappe.get_all('PGS Template', filters={'docstatus': 1, 'content_hash': ['is', 'not set']}, pluck='name')
+
+	for name in templates:
+		template = frappe.get_doc('PGS Template', name)
+		content_hash = get_content_hash([item.as_dict() for item in template.items], template.section_order)
+		template.db_set('content_hash', content_hash, update_modified=False)
@@ -0,0 +1,28 @@
+"""
+Realtime push of assignment changes to the assigned user's devices
+Online devices apply the events to their local copy; get_assigned_forms remains the fallback.
+"""
+
+import frappe
+
+ASSIGNMENT_EVENT = 'farm_connector_assignment'
+
+
+def publish_assignment_changes(user, changed=None, removed=None):
+	"""
+	Send one compact event to a user's room once the transaction commits.
+
+	Args:
+		user (str): Assigned user
+		changed (list): Assignment dicts to upsert; only changed fields and name are required
+		removed (list): [{name, reason}] of assignments that left the user's list
+	"""
+	if not user or not (changed or removed):
+		return
+
+	frappe.publish_realtime(
+		ASSIGNMENT_EVENT,
+		{'changed': changed or [], 'removed': removed or []},
+		user=user,
+		after_commit=True
+	)
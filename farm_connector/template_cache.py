@@ -0,0 +1,74 @@
+"""
+Cache of compiled PGS Templates
+A submitted template never changes, so its compiled form is kept per (name, modified):
+in a bounded in-process LRU keyed by site as well, and in Redis shared by all workers.
+The in-process entries are handed to every request of the worker, so compiled values must be immutable.
+Redis also holds the current modified of each template, so a hit needs no database access.
+Entries are dropped when a template is cancelled or deleted; an amendment is a new template.
+"""
+
+from collections import OrderedDict
+
+import frappe
+
+# Compiled templates kept in each worker process
+PROCESS_CACHE_SIZE = 128
+
+VERSION_KEY = 'farm_connector:pgs_template_version'
+COMPILED_KEY = 'farm_connector:pgs_template_compiled'
+
+_process_cache = OrderedDict()
+
+
+def get_compiled(template_name, compile_template):
+	"""
+	Return the compiled form of a template.
+
+	Args:
+		template_name (str): PGS Template name
+		compile_template (callable): Called with the template name on a miss;
+			returns (modified, compiled value) and throws for unusable templates.
+			The compiled value is shared between requests and must be immutable.
+	"""
+	modified = frappe.cache.hget(VERSION_KEY, template_name)
+	if modified:
+		key = (frappe.local.site, template_name, modified)
+		compiled = _process_cache.get(key)
+		if compiled is not None:
+			_process_cache.move_to_end(key)
+			return compiled
+
+		entry = frappe.cache.hget(COMPILED_KEY, template_name)
+		if entry and entry['modified'] == modified:
+			_remember(key, entry['compiled'])
+			return entry['compiled']
+
+	modified, compiled = compile_template(template_name)
+	modified = str(modified)
+	frappe.cache.hset(COMPILED_KEY, template_name, {'modified': modified, 'compiled': compiled})
+	frappe.cache.hset(VERSION_KEY, template_name, modified)
+	_remember((frappe.local.site, template_name, modified), compiled)
+	return compiled
+
+
+def get_version(template_name):
+	"""Return the modified timestamp of a compiled template, or None if it is not cached."""
+	return frappe.cache.hget(VERSION_KEY, template_name)
+
+
+def clear(template_name):
+	"""Forget a template now and after commit; process caches miss because its version is gone."""
+
+	def clear_keys():
+		frappe.cache.hdel(VERSION_KEY, template_name)
+		frappe.cache.hdel(COMPILED_KEY, template_name)
+
+	clear_keys()
+	frappe.db.after_commit.add(clear_keys)
+
+
+def _remember(key, compiled):
+	_process_cache[key] = compiled
+	_process_cache.move_to_end(key)
+	while len(_process_cache) > PROCESS_CACHE_SIZE:
+		_process_cache.popitem(last=False)
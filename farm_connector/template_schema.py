@@ -0,0 +1,279 @@
+"""
+Compiled schema of a submitted PGS Template
+Built once per template version and shared by every PGS code path: the field definitions
+served to the mobile app, the template details, survey creation and survey validation.
+"""
+
+import hashlib
+import json
+from types import MappingProxyType
+
+import frappe
+from frappe.utils import flt
+
+from farm_connector import template_cache
+
+# Map PGS field types to Frappe field types
+PGS_TYPE_MAP = {
+	# Data/Numeric types
+	'Data': 'Data',
+	'Int': 'Int',
+	'Float': 'Float',
+	'Currency': 'Currency',
+	'Percent': 'Float',
+	'Phone': 'Data',
+	# Text types
+	'Small Text': 'Small Text',
+	'Long Text': 'Long Text',
+	'Text': 'Text',
+	'Text Editor': 'Text Editor',
+	'Markdown Editor': 'Markdown Editor',
+	'HTML Editor': 'Text Editor',
+	'Code': 'Code',
+	'JSON': 'Code',
+	# Selection types
+	'Select': 'Select',
+	'Autocomplete': 'Autocomplete',
+	# Date/Time types
+	'Date': 'Date',
+	'Datetime': 'Datetime',
+	'Time': 'Time',
+	'Duration': 'Duration',
+	# Link types
+	'Link': 'Link',
+	'Dynamic Link': 'Dynamic Link',
+	# File/Media types
+	'Attachment': 'Attach',
+	'Attach Image': 'Attach Image',
+	'Signature': 'Signature',
+	# Special types
+	'Color': 'Color',
+	'Rating': 'Rating',
+	'Barcode': 'Data',
+	'Icon': 'Data',
+	'Password': 'Password',
+	'Geolocation': 'Geolocation',
+	'Read Only': 'Read Only',
+	# PGS-specific types
+	'Radio': 'Select',
+	'Checkbox': 'Check',
+	'Multi-Select': 'Small Text',
+	'Formula': 'Data',
+	# Layout types
+	'Section Break': 'Section Break',
+	'Column Break': 'Column Break',
+	'Tab Break': 'Tab Break',
+}
+
+# PGS Template Section fields copied to the survey and returned by get_template_details
+ITEM_FIELDS = (
+	'section',
+	'field_label',
+	'fieldname',
+	'field_type',
+	'is_mandatory',
+	'options',
+	'link_doctype',
+	'formula',
+	'allow_multiple',
+	'help_text',
+	'display_depends_on',
+	'mandatory_depends_on',
+)
+
+# Field types whose values are compared as numbers in expressions
+NUMERIC_FIELD_TYPES = ('Int', 'Float', 'Currency', 'Percent', 'Rating')
+
+
+def slugify(label):
+	"""The variable name of a field label, as used in submitted values and expressions."""
+	return (label or '').lower().replace(' ', '_').replace('-', '_')
+
+
+def to_expression_value(value, field_type):
+	"""Convert a stored reading to the value seen by formulas and depends-on expressions."""
+	try:
+		if field_type in NUMERIC_FIELD_TYPES or (value and str(value).replace('.', '', 1).replace('-', '', 1).isdigit()):
+			return flt(value)
+	except Exception:
+		pass
+	return value
+
+
+def get_content_hash(items, section_order):
+	"""
+	Stable hash of what a template renders: its items in order and its section order.
+	Empty values hash the same whether stored as NULL or as an empty string.
+	"""
+	content = {
+		'items': [{field: item.get(field) or None for field in ITEM_FIELDS} for item in items],
+		'section_order': section_order or None
+	}
+	return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+class TemplateSchema:
+	"""
+	Immutable, precomputed view of a submitted PGS Template.
+	Rows and field definitions are read-only mappings in tuples, as one instance is shared
+	by every request of a worker; fields and details hand out copies for responses.
+	"""
+
+	def __init__(self, name, modified, category, section_order, items, content_hash=None):
+		self._set('name', name)
+		self._set('modified', modified)
+		self._set('category', category)
+		self._set('section_order', section_order)
+		self._set('content_hash', content_hash or get_content_hash(items, section_order))
+
+		# Template rows, with their submitted value key and expression variable
+		rows = []
+		for item in items:
+			row = {field: item.get(field) for field in ITEM_FIELDS}
+			row['variable'] = slugify(row['field_label'])
+			row['key'] = row['fieldname'] or row['variable']
+			row['is_numeric'] = row['field_type'] in NUMERIC_FIELD_TYPES
+			for expression in ('formula', 'display_depends_on', 'mandatory_depends_on'):
+				row[expression] = (row[expression] or '').strip() or None
+			rows.append(MappingProxyType(row))
+
+		self._set('items', tuple(rows))
+		self._set('sections', self._order_sections())
+		self._set('_fields', tuple(MappingProxyType(field) for field in self._build_fields()))
+
+	def _set(self, name, value):
+		object.__setattr__(self, name, value)
+
+	def __setattr__(self, name, value):
+		raise AttributeError(f"{type(self).__name__} is immutable")
+
+	def __reduce__(self):
+		# Read-only mappings cannot be pickled; the cached copy in Redis is rebuilt from the rows
+		return (
+			TemplateSchema,
+			(self.name, self.modified, self.category, self.section_order, [dict(row) for row in self.items], self.content_hash)
+		)
+
+	@property
+	def fields(self):
+		"""Standard Frappe field definitions, as new dicts."""
+		return [dict(field) for field in self._fields]
+
+	@property
+	def details(self):
+		"""Payload of get_template_details."""
+		return {
+			'content_hash': self.content_hash,
+			'items': [{field: row[field] for field in ITEM_FIELDS} for row in self.items],
+			'section_order': self.section_order
+		}
+
+	def _order_sections(self):
+		"""Return ((section, items), ...) with the saved section order first."""
+		try:
+			section_order = json.loads(self.section_order or '[]')
+		except Exception:
+			section_order = []
+
+		sections = {}
+		for row in self.items:
+			sections.setdefault(row['section'] or 'General', []).append(row)
+
+		ordered = [s for s in section_order if s in sections]
+		ordered += [s for s in sections if s not in ordered]
+		return tuple((section, tuple(sections[section])) for section in ordered)
+
+	def _build_fields(self):
+		"""Convert the items into standard Frappe field definitions, one Section Break per section."""
+		fields = []
+		for section_name, rows in self.sections:
+			fields.append({
+				'fieldname': f'section_{section_name.lower().replace(" ", "_")}',
+				'label': section_name,
+				'fieldtype': 'Section Break',
+				'options': None,
+				'reqd': 0,
+				'read_only': 0,
+				'hidden': 0,
+				'depends_on': None,
+				'description': None,
+				'default': None,
+				'length': 0,
+				'precision': None
+			})
+
+			for row in rows:
+				field_type = row['field_type']
+				if field_type in ('Select', 'Radio', 'Multi-Select', 'Autocomplete'):
+					options_value = row['options']
+				elif field_type in ('Link', 'Dynamic Link'):
+					options_value = row['link_doctype']
+				else:
+					options_value = None
+
+				fields.append({
+					'fieldname': row['key'],
+					'label': row['field_label'],
+					'fieldtype': PGS_TYPE_MAP.get(field_type, 'Data'),
+					'options': options_value,
+					'reqd': row['is_mandatory'],
+					'read_only': 1 if field_type in ('Formula', 'Read Only') else 0,
+					'hidden': 0,
+					'depends_on': row['display_depends_on'],
+					'description': row['help_text'] or None,
+					'default': None,
+					'length': 0,
+					'precision': 2 if field_type in ('Currency', 'Percent') else None,
+					# Extra PGS metadata (ignored by mobile if unknown, useful for form rendering)
+					'pgs_field_type': field_type,
+					'pgs_section': row['section'],
+					'pgs_formula': row['formula'],
+					'pgs_mandatory_depends_on': row['mandatory_depends_on'],
+				})
+
+		return fields
+
+
+def get_template_hashes(template_names):
+	"""Return {template: content_hash} of submitted templates, from the compiled cache where possible."""
+	hashes = {}
+	missing = []
+	for name in set(template_names) - {None, ''}:
+		if template_cache.get_version(name):
+			hashes[name] = get_template_schema(name).content_hash
+		else:
+			missing.append(name)
+
+	if missing:
+		hashes.update(frappe.get_all(
+			'PGS Template',
+			filters={'name': ['in', missing], 'docstatus': 1},
+			fields=['name', 'content_hash'],
+			as_list=True
+		))
+
+	return hashes
+
+
+def get_template_schema(template_name):
+	"""Return the compiled schema of a submitted PGS Template; throws if it is missing or not submitted."""
+	return template_cache.get_compiled(template_name, _compile)
+
+
+def _compile(template_name):
+	if not frappe.db.exists('PGS Template', template_name):
+		frappe.throw(f"PGS Template '{template_name}' does not exist", frappe.DoesNotExistError)
+
+	template = frappe.get_doc('PGS Template', template_name)
+	if template.docstatus != 1:
+		frappe.throw(f"PGS Template '{template_name}' is not submitted")
+
+	schema = TemplateSchema(
+		template.name,
+		str(template.modified),
+		template.category,
+		template.section_order,
+		[item.as_dict() for item in template.items],
+		template.content_hash
+	)
+	return schema.modified, schema
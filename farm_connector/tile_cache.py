@@ -0,0 +1,76 @@
+"""
+On-disk cache of encoded vector tiles
+Tiles are removed after commit whenever an indexed geometry inside them changes.
+"""
+
+import os
+import shutil
+
+import frappe
+from frappe.utils import scrub
+
+from farm_connector import geo
+
+# Zoom levels served and cached by get_polygon_tile
+MIN_TILE_ZOOM = 0
+MAX_TILE_ZOOM = 20
+
+# Above this many tiles at one zoom, drop the whole zoom level instead of single tiles
+MAX_INVALIDATED_TILES = 256
+
+
+def get_cache_dir(doctype):
+	return frappe.get_site_path('private', 'farm_connector_tiles', scrub(doctype))
+
+
+def get_tile_path(doctype, z, x, y):
+	return os.path.join(get_cache_dir(doctype), str(z), str(x), f'{y}.mvt')
+
+
+def read_tile(doctype, z, x, y):
+	"""Return the cached tile bytes, or None on a cache miss."""
+	try:
+		with open(get_tile_path(doctype, z, x, y), 'rb') as f:
+			return f.read()
+	except FileNotFoundError:
+		return None
+
+
+def write_tile(doctype, z, x, y, data):
+	"""Store an encoded tile, replacing any cached copy atomically."""
+	path = get_tile_path(doctype, z, x, y)
+	os.makedirs(os.path.dirname(path), exist_ok=True)
+
+	tmp_path = f'{path}.{frappe.generate_hash(length=8)}.tmp'
+	with open(tmp_path, 'wb') as f:
+		f.write(data)
+	os.replace(tmp_path, path)
+
+
+def invalidate_bboxes(doctype, bboxes):
+	"""Remove the cached tiles touching the given (min_lat, min_lng, max_lat, max_lng) boxes after commit."""
+	bboxes = [bbox for bbox in bboxes if bbox and None not in bbox]
+	if bboxes:
+		frappe.db.after_commit.add(lambda: _remove_tiles(doctype, bboxes))
+
+
+def clear_doctype(doctype):
+	"""Remove every cached tile of a DocType after commit."""
+	frappe.db.after_commit.add(lambda: shutil.rmtree(get_cache_dir(doctype), ignore_errors=True))
+
+
+def _remove_tiles(doctype, bboxes):
+	for zoom in range(MIN_TILE_ZOOM, MAX_TILE_ZOOM + 1):
+		tiles = set()
+		for bbox in bboxes:
+			tiles.update(geo.tiles_for_bbox(*bbox, zoom, max_tiles=MAX_INVALIDATED_TILES) or [None])
+
+		if None in tiles or len(tiles) > MAX_INVALIDATED_TILES:
+			shutil.rmtree(os.path.join(get_cache_dir(doctype), str(zoom)), ignore_errors=True)
+			continue
+
+		for z, x, y in tiles:
+			try:
+				os.remove(get_tile_path(doctype, z, x, y))
+			except FileNotFoundError:
+				pass